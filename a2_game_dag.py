@@ -0,0 +1,304 @@
+"""Minichess game trees in which transpositions share a node.
+
+Different move orders often reach the same Minichess position. A GameTree stores a separate
+copy of that position (and everything below it) for each move order; the GameDAG in this
+module stores each position once, keyed by its Zobrist key, so that deep complete game trees
+take far fewer nodes.
+"""
+from __future__ import annotations
+import copy
+from typing import Optional, Union
+
+import a2_game_tree
+import a2_minichess
+
+
+class _Position:
+    """A Minichess position in a GameDAG, shared by every move sequence that reaches it.
+
+    Instance Attributes:
+      - is_white_move: True if White is to make the next move, False otherwise
+      - white_win_probability: the white win probability of this position, using the same
+            rule as GameTree._update_white_win_probability
+      - subtrees: the moves out of this position, in the order they were added
+      - parents: the positions that have a move leading to this position
+    """
+    __slots__ = ('is_white_move', 'white_win_probability', 'subtrees', 'parents')
+    is_white_move: bool
+    white_win_probability: float
+    subtrees: list[GameDAG]
+    parents: list[_Position]
+
+    def __init__(self, is_white_move: bool, white_win_probability: float) -> None:
+        self.is_white_move = is_white_move
+        self.white_win_probability = white_win_probability
+        self.subtrees = []
+        self.parents = []
+
+    def update_white_win_probability(self) -> bool:
+        """Recalculate the white win probability of this position from its subtrees, and return
+        whether it changed.
+        """
+        if self.subtrees == []:
+            return False
+
+        old = self.white_win_probability
+        probabilities = [subtree.white_win_probability for subtree in self.subtrees]
+        if self.is_white_move:
+            self.white_win_probability = max(probabilities)
+        else:
+            self.white_win_probability = a2_game_tree.average_probability(probabilities)
+
+        return self.white_win_probability != old
+
+
+class GameDAG:
+    """A decision tree for Minichess moves in which identical positions share one node.
+
+    A GameDAG has the same public interface as a GameTree (move, is_white_move,
+    white_win_probability, get_subtrees, find_subtree_by_move and best_subtree), so it can be
+    used by any player that uses a GameTree. Each GameDAG object represents one move into a
+    position; all the moves that reach the same position (with the same number of moves
+    made) share that position's subtrees and white win probability.
+
+    Instance Attributes:
+      - move: the current chess move, or '*' if this represents the start of a game
+
+    >>> dag = GameDAG()
+    >>> dag.insert_move_sequence(['a2b3', 'b4b3', 'c2b3'], 1.0)
+    >>> dag.insert_move_sequence(['c2b3', 'b4b3', 'a2b3'])
+    >>> # Both move orders reach the same position, which is stored once
+    >>> dag.get_position_count()
+    6
+    >>> second = dag.find_subtree_by_move('c2b3').get_subtrees()[0].get_subtrees()[0]
+    >>> second.move
+    'a2b3'
+    >>> second.white_win_probability
+    1.0
+    >>> dag.white_win_probability
+    1.0
+    """
+    move: Union[str, int]
+
+    # Private Instance Attributes:
+    #   - _position: the position this move leads to
+    #   - _positions: (root only) a dictionary mapping the Zobrist key (including the move count)
+    #       of every position in this GameDAG to that position
+    #   - _game: (root only) the game state at the root of this GameDAG
+    _position: _Position
+    _positions: Optional[dict[int, _Position]]
+    _game: Optional[a2_minichess.MinichessGame]
+
+    def __init__(self, move: Union[str, int] = a2_game_tree.GAME_START_MOVE,
+                 game_state: Optional[a2_minichess.MinichessGame] = None) -> None:
+        """Initialize a new, empty GameDAG rooted at game_state (the initial state if None).
+
+        game_state is copied, and is not mutated by this GameDAG.
+        """
+        if game_state is None:
+            game_state = a2_minichess.MinichessGame()
+
+        self.move = move
+        self._game = copy.deepcopy(game_state)
+        self._position = _Position(game_state.is_white_move(),
+                                   1.0 if game_state.get_winner() == 'White' else 0.0)
+        self._positions = {game_state.get_zobrist_key(include_move_count=True): self._position}
+
+    @classmethod
+    def _edge(cls, move: Union[str, int], position: _Position) -> GameDAG:
+        """Return a new (non-root) GameDAG for the given move into position."""
+        edge = cls.__new__(cls)
+        edge.move = move
+        edge._position = position
+        edge._positions = None
+        edge._game = None
+        return edge
+
+    @property
+    def is_white_move(self) -> bool:
+        """True if White is to make the next move after this, False otherwise."""
+        return self._position.is_white_move
+
+    @property
+    def white_win_probability(self) -> float:
+        """The white win probability of the position after this move."""
+        return self._position.white_win_probability
+
+    def get_subtrees(self) -> list[GameDAG]:
+        """Return the subtrees of this game tree."""
+        return self._position.subtrees
+
+    def find_subtree_by_move(self, move: Union[str, int]) -> Optional[GameDAG]:
+        """Return the subtree corresponding to the given move.
+
+        Return None if no subtree corresponds to that move.
+        """
+        for subtree in self._position.subtrees:
+            if subtree.move == move:
+                return subtree
+
+        return None
+
+    def best_subtree(self) -> Optional[GameDAG]:
+        """Return the subtree with the best white win probability for the player making the
+        next move, like GameTree.best_subtree.
+        """
+        return a2_game_tree.find_best_subtree(self._position.subtrees,
+                                              self._position.is_white_move)
+
+    def get_position_count(self) -> int:
+        """Return the number of distinct positions in this GameDAG.
+
+        Preconditions:
+            - self is the root of a GameDAG
+        """
+        return len(self._positions)
+
+    def insert_move_sequence(self, moves: list[Union[str, int]],
+                             white_win_probability: float = 0.0) -> None:
+        """Insert the given sequence of moves into this GameDAG, like
+        GameTree.insert_move_sequence.
+
+        A position reached for the first time is given white_win_probability; if a move leads
+        to a position that is already in this GameDAG, the existing node is shared. The white
+        win probabilities of every position affected by the insertion are then recalculated,
+        including positions that reach a shared node by a different move order.
+
+        Raise a ValueError if moves is not a valid sequence of moves from the root (in which
+        case nothing is inserted), or if self is not the root of a GameDAG.
+        """
+        if self._positions is None:
+            raise ValueError('Move sequences can only be inserted at the root of a GameDAG')
+
+        game = self._game
+
+        # Check the whole sequence first, so that an invalid move leaves this GameDAG unchanged
+        moves_made = 0
+        try:
+            for move in moves:
+                game.push(move)
+                moves_made += 1
+        finally:
+            for _ in range(0, moves_made):
+                game.pop()
+
+        path = [self._position]
+        try:
+            for move in moves:
+                game.push(move)
+                position = path[-1]
+                subtree = self._find_or_add_subtree(position, move, game, white_win_probability)
+                path.append(subtree._position)
+        finally:
+            for _ in range(0, len(path) - 1):
+                game.pop()
+
+        for i in range(len(path) - 1, -1, -1):
+            if path[i].update_white_win_probability():
+                for parent in path[i].parents:
+                    if i == 0 or parent is not path[i - 1]:
+                        _propagate_white_win_probability(parent)
+
+    def _find_or_add_subtree(self, position: _Position, move: Union[str, int],
+                             game: a2_minichess.MinichessGame,
+                             white_win_probability: float) -> GameDAG:
+        """Return the subtree of position for move, adding it if necessary.
+
+        game is the game state after move. A new subtree shares the node of an existing
+        position with the same Zobrist key, or else creates a new position with the given
+        white win probability.
+        """
+        for subtree in position.subtrees:
+            if subtree.move == move:
+                return subtree
+
+        key = game.get_zobrist_key(include_move_count=True)
+        child = self._positions.get(key)
+        if child is None:
+            child = _Position(game.is_white_move(), white_win_probability)
+            self._positions[key] = child
+
+        subtree = GameDAG._edge(move, child)
+        position.subtrees.append(subtree)
+        child.parents.append(position)
+        return subtree
+
+    def __str__(self) -> str:
+        """Return a string representation of this tree, in the same format as GameTree.
+
+        Shared positions are printed once for every move sequence that reaches them.
+        """
+        return self._str_indented(0)
+
+    def _str_indented(self, depth: int) -> str:
+        """Return an indented string representation of this tree.
+
+        The indentation level is specified by the <depth> parameter.
+        """
+        turn_desc = "White's move" if self.is_white_move else "Black's move"
+        s = '  ' * depth + f'{self.move} -> {turn_desc} {self.white_win_probability}\n'
+        for subtree in self.get_subtrees():
+            s += subtree._str_indented(depth + 1)
+        return s
+
+
+def _propagate_white_win_probability(position: _Position) -> None:
+    """Recalculate the white win probability of position, and of every position above it whose
+    probability changes as a result.
+    """
+    if position.update_white_win_probability():
+        for parent in position.parents:
+            _propagate_white_win_probability(parent)
+
+
+def generate_complete_game_dag(root_move: Union[str, int],
+                               game_state: a2_minichess.MinichessGame, d: int) -> GameDAG:
+    """Generate a complete GameDAG of depth d for all valid moves from the current game_state.
+
+    This is the same as a2_part2.generate_complete_game_tree, except that positions reached
+    by more than one sequence of moves are generated (and stored) only once. The returned
+    GameDAG has the same moves, subtree order and white win probabilities as the GameTree
+    that generate_complete_game_tree would return.
+
+    game_state is not mutated.
+
+    Preconditions:
+        - d >= 0
+    """
+    dag = GameDAG(root_move, game_state)
+    game = dag._game
+    _expand_position(dag, dag._position, game, d)
+    return dag
+
+
+def _expand_position(dag: GameDAG, position: _Position, game: a2_minichess.MinichessGame,
+                     d: int) -> None:
+    """Add every move sequence of length <= d from game (whose position is position) to dag,
+    and calculate the white win probabilities of the new positions.
+    """
+    if d == 0:
+        return
+
+    for move in game.get_valid_moves():
+        game.push(move)
+        key = game.get_zobrist_key(include_move_count=True)
+        is_new = key not in dag._positions
+        subtree = dag._find_or_add_subtree(position, move, game,
+                                           1.0 if game.get_winner() == 'White' else 0.0)
+        if is_new:
+            _expand_position(dag, subtree._position, game, d - 1)
+        game.pop()
+
+    position.update_white_win_probability()
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['copy', 'a2_game_tree', 'a2_minichess']
+    })
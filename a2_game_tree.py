@@ -1,8 +1,25 @@
 from __future__ import annotations  
-from typing import Optional  
+import heapq  
+import itertools  
+import operator  
+from typing import Iterable, Optional, Union  
+  
+import a2_minichess  
   
 GAME_START_MOVE = '*'  
   
+# The number of fractional bits in the fixed-point sums of white win probabilities. Every float  
+# between 0 and 1 is a whole number of units of 2 ** -_SUM_FRACTION_BITS, so these sums are exact.  
+_SUM_FRACTION_BITS = 1074  
+  
+# The number of subtrees from which a tree keeps a heap and sum of its subtree probabilities.  
+# Narrower trees (which are almost all of them) just look at every subtree, which is as fast  
+# for so few subtrees and saves the memory of the heap and sum.  
+_AGGREGATE_MIN_SUBTREES = 16  
+  
+# Return the white win probability of a tree, without recalculating it if it is out of date  
+_get_white_win_probability = operator.attrgetter('_white_win_probability')  
+  
   
 class GameTree:  
     """A decision tree for Minichess moves. 
@@ -11,29 +28,86 @@ class GameTree:
     the current player (who will make the next move) is White or Black. 
  
     Instance Attributes: 
-      - move: the current chess move (expressed in chess notation), or '*' if this tree 
-              represents the start of a game 
+      - move: the current chess move (expressed in chess notation, or as a move code from 
+              a2_minichess.encode_move), or '*' if this tree represents the start of a game. 
+              All the moves in one tree should use the same form, but subtrees can be 
+              found (and move sequences inserted) by moves in either form, which are 
+              converted to the form of the existing subtrees. 
       - is_white_move: True if White is to make the next move after this, False otherwise 
       -  white_win_probability: a float between 0 and 1, which represents the probability of white 
                winning the minichess game 
+      - lazy: whether this tree recalculates its white win probability only when it is read 
+              (see below) 
+ 
+    By default, the white win probability of a tree is recalculated as soon as a subtree is 
+    added or a move sequence is inserted through it. In a lazy tree, these only mark the 
+    white win probability as out of date, and it is recalculated (along with any out of date 
+    probabilities of its subtrees) the next time it is read. This saves the recalculations 
+    for trees that have many move sequences inserted between reads. The probabilities that 
+    are read are the same either way. Subtrees created by inserting move sequences into a 
+    lazy tree are lazy too. 
+ 
+    A tree with many subtrees also keeps a heap (and, for Black's move, a running sum) of the 
+    white win probabilities of its subtrees, so that a change to a few subtrees only requires 
+    counting those again rather than adding up all of them. A subtree whose white win 
+    probability changes without going through this tree (say, because a move sequence is 
+    inserted into it directly) is counted again the next time this tree is recalculated. 
  
     Representation Invariants: 
         - self.move == GAME_START_MOVE or self.move is a valid Minichess move 
         - self.move != GAME_START_MOVE or self.is_white_move == True 
         - 0.0 <= self.white_win_probability <= 1.0 
     """  
-    move: str  
+    move: Union[str, int]  
     is_white_move: bool  
-    white_win_probability: float  
+    lazy: bool  
   
     # Private Instance Attributes:  
     #  - _subtrees:  
     #      the subtrees of this tree, which represent the game trees after a possible  
     #      move by the current player  
+    #  - _subtrees_by_move:  
+    #      a dictionary mapping the move of each subtree to its index in _subtrees (the first  
+    #      one, if more than one subtree has the same move), kept in sync with _subtrees so  
+    #      that subtrees can be found by move in constant time. This is None while this tree  
+    #      has fewer than two subtrees, since most nodes in a game tree have at most one and  
+    #      an extra dictionary for each of them would cost more than it saves.  
+    #  - _probability_sum:  
+    #      if this tree is Black's move, the sum of the white win probabilities of its  
+    #      subtrees, as an exact fixed-point number with _SUM_FRACTION_BITS fractional bits.  
+    #      Being exact, it can be updated as subtrees change without ever drifting from the  
+    #      true sum. None if this tree is White's move or has fewer than  
+    #      _AGGREGATE_MIN_SUBTREES subtrees.  
+    #  - _probability_heap:  
+    #      a heap of (-probability, index) pairs if this tree is White's move, or  
+    #      (probability, index) pairs if it is Black's move, so that the pair at the top is  
+    #      for the best subtree for the player making the next move (the first one, on  
+    #      ties). It holds a pair for the counted white win probability of each subtree, and  
+    #      possibly some out of date pairs, which are discarded when they reach the top.  
+    #      None if this tree has fewer than _AGGREGATE_MIN_SUBTREES subtrees.  
+    #  - _counted_probabilities:  
+    #      the white win probability of each subtree as it was last counted in  
+    #      _probability_sum and _probability_heap. Any subtree whose white win probability no  
+    #      longer matches is counted again before these are used, so they never drift from  
+    #      the subtrees. None if this tree has fewer than _AGGREGATE_MIN_SUBTREES subtrees.  
+    #    These three default to None as class attributes, so that the many trees with fewer  
+    #    subtrees don't store them at all.  
+    #  - _white_win_probability:  
+    #      the white win probability of this tree, which is out of date if _stale is True  
+    #  - _stale:  
+    #      True if this tree is lazy and its white win probability needs to be recalculated  
+    #      before it is next read  
     _subtrees: list[GameTree]  
+    _subtrees_by_move: Optional[dict[Union[str, int], int]]  
+    _probability_sum: Optional[int] = None  
+    _probability_heap: Optional[list[tuple[float, int]]] = None  
+    _counted_probabilities: Optional[list[float]] = None  
+    _white_win_probability: float  
+    _stale: bool  
   
-    def __init__(self, move: str = GAME_START_MOVE,  
-                 is_white_move: bool = True, white_win_probability: float = 0.0) -> None:  
+    def __init__(self, move: Union[str, int] = GAME_START_MOVE,  
+                 is_white_move: bool = True, white_win_probability: float = 0.0,  
+                 lazy: bool = False) -> None:  
         """Initialize a new game tree. 
  
         Note that this initializer uses optional arguments, as illustrated below. 
@@ -47,28 +121,229 @@ class GameTree:
         self.move = move  
         self.is_white_move = is_white_move  
         self._subtrees = []  
-        self.white_win_probability = white_win_probability  
+        self._subtrees_by_move = None  
+        self.lazy = lazy  
+        self._white_win_probability = white_win_probability  
+        self._stale = False  
+  
+    @property  
+    def white_win_probability(self) -> float:  
+        """The white win probability of this tree."""  
+        self._recalculate_if_stale()  
+        return self._white_win_probability  
+  
+    @white_win_probability.setter  
+    def white_win_probability(self, value: float) -> None:  
+        """Set the white win probability of this tree."""  
+        self._white_win_probability = value  
+        self._stale = False  
   
     def get_subtrees(self) -> list[GameTree]:  
         """Return the subtrees of this game tree."""  
         return self._subtrees  
   
-    def find_subtree_by_move(self, move: str) -> Optional[GameTree]:  
+    def best_subtree(self) -> Optional[GameTree]:  
+        """Return the subtree with the best white win probability for the player making the 
+        next move: the highest if White, or the lowest if Black. If several subtrees are 
+        equally good, return the first of them. Return None if this tree is a leaf. 
+ 
+        For a tree with many subtrees, the best subtree is kept at the top of its heap of 
+        subtree probabilities, once any subtrees that have changed are counted again. 
+        """  
+        if len(self._subtrees) < _AGGREGATE_MIN_SUBTREES:  
+            return find_best_subtree(self._subtrees, self.is_white_move)  
+        else:  
+            self._recalculate_if_stale()  
+            self._count_subtrees()  
+            return self._subtrees[self._best_index()]  
+  
+    def find_subtree_by_move(self, move: Union[str, int]) -> Optional[GameTree]:  
         """Return the subtree corresponding to the given move. 
  
         Return None if no subtree corresponds to that move. 
         """  
-        for subtree in self._subtrees:  
-            if subtree.move == move:  
-                return subtree  
+        index = self._find_subtree_index(self._move_in_form(move))  
+        if index == -1:  
+            return None  
+        else:  
+            return self._subtrees[index]  
   
-        return None  
+    def _move_in_form(self, move: Union[str, int]) -> Union[str, int]:  
+        """Return the given move in the same form as the moves of the subtrees of this tree. 
+ 
+        Return move unchanged if this tree is a leaf, or if move is not a Minichess move and 
+        so has no other form. 
+        """  
+        if self._subtrees == []:  
+            return move  
+        elif isinstance(move, str) == isinstance(self._subtrees[0].move, str):  
+            return move  
+  
+        converted = _convert_move(move)  
+        if converted is None:  
+            return move  
+        else:  
+            return converted  
+  
+    def _find_subtree_index(self, move: Union[str, int]) -> int:  
+        """Return the index in self._subtrees of the subtree corresponding to the given move, 
+        or -1 if no subtree corresponds to that move. 
+ 
+        Preconditions: 
+            - move == self._move_in_form(move) 
+        """  
+        if self._subtrees_by_move is not None:  
+            return self._subtrees_by_move.get(move, -1)  
+        elif self._subtrees != [] and self._subtrees[0].move == move:  
+            return 0  
+        else:  
+            return -1  
   
     def add_subtree(self, subtree: GameTree) -> None:  
         """Add a subtree to this game tree."""  
   
+        self._append_subtree(subtree)  
+        self._subtrees_changed()  
+  
+    def _append_subtree(self, subtree: GameTree) -> None:  
+        """Add a subtree to this game tree, without recalculating its white win probability."""  
         self._subtrees.append(subtree)  
-        self._update_white_win_probability()  
+        index = len(self._subtrees) - 1  
+        if self._subtrees_by_move is not None:  
+            self._subtrees_by_move.setdefault(subtree.move, index)  
+        elif index > 0:  
+            self._subtrees_by_move = {}  
+            for i in range(0, index + 1):  
+                self._subtrees_by_move.setdefault(self._subtrees[i].move, i)  
+  
+    def merge(self, other: GameTree) -> None:  
+        """Merge the move sequences of other into this tree. 
+ 
+        Afterwards, this tree is the same as if every move sequence inserted into other had 
+        been inserted into this tree instead (after this tree's own): subtrees for new moves 
+        are added after the existing ones, a move that is already a leaf of this tree keeps 
+        its white win probability, and the white win probabilities of this tree and every 
+        subtree that was merged into are recalculated. 
+ 
+        The subtrees of other are moved into this tree rather than copied, so other should 
+        not be used afterwards. 
+ 
+        Preconditions: 
+            - self.move == other.move 
+            - self.is_white_move == other.is_white_move 
+        """  
+        for subtree in other._subtrees:  
+            subtree.move = self._move_in_form(subtree.move)  
+            index = self._find_subtree_index(subtree.move)  
+            if index == -1:  
+                self._append_subtree(subtree)  
+            else:  
+                self._subtrees[index].merge(subtree)  
+  
+        self._subtrees_changed()  
+  
+    def _subtrees_changed(self) -> None:  
+        """Recalculate the white win probability of this tree after its subtrees have changed, 
+        or (if this tree is lazy) mark it to be recalculated when it is next read. 
+        """  
+        if self.lazy:  
+            self._stale = self._subtrees != []  
+        elif len(self._subtrees) == 1:  
+            # The maximum or average of one white win probability is that probability, and  
+            # most trees have only one subtree  
+            self._white_win_probability = self._subtrees[0]._white_win_probability  
+        else:  
+            self._update_white_win_probability()  
+  
+    def _recalculate_if_stale(self) -> None:  
+        """Recalculate the white win probability of this tree if it is out of date."""  
+        if self._stale:  
+            self._stale = False  
+            self._update_white_win_probability()  
+  
+    def _subtree_probabilities(self) -> list[float]:  
+        """Return the white win probabilities of the subtrees of this tree, in order."""  
+        if self.lazy:  
+            return [subtree.white_win_probability for subtree in self._subtrees]  
+        else:  
+            # The subtrees of an eager tree are never out of date, so skip the property  
+            return list(map(_get_white_win_probability, self._subtrees))  
+  
+    def _count_subtrees(self) -> None:  
+        """Bring the sum and heap of subtree white win probabilities up to date, by counting 
+        again each subtree whose white win probability has changed since it was last counted 
+        (or which has been added since then). 
+ 
+        This includes subtrees that have changed without going through this tree: 
+ 
+        >>> tree = GameTree() 
+        >>> for i in range(20): 
+        ...     tree.insert_move_sequence(['x', f'c{i}', 'y']) 
+        >>> x = tree.find_subtree_by_move('x') 
+        >>> x.find_subtree_by_move('c0').insert_move_sequence(['z'], 1.0) 
+        >>> tree.insert_move_sequence(['x', 'c5', 'y']) 
+        >>> x.white_win_probability  # doctest: +NORMALIZE_WHITESPACE 
+        0.05 
+        >>> tree = GameTree() 
+        >>> for i in range(20): 
+        ...     tree.insert_move_sequence([f'c{i}', 'y']) 
+        >>> tree.find_subtree_by_move('c7').insert_move_sequence(['z'], 1.0) 
+        >>> tree.insert_move_sequence(['c5', 'y']) 
+        >>> tree.white_win_probability  # doctest: +NORMALIZE_WHITESPACE 
+        0.5 
+        >>> tree.best_subtree().move  # doctest: +NORMALIZE_WHITESPACE 
+        'c7' 
+ 
+        Preconditions: 
+            - len(self.get_subtrees()) >= _AGGREGATE_MIN_SUBTREES 
+        """  
+        probabilities = self._subtree_probabilities()  
+        counted = self._counted_probabilities  
+        if counted is None or len(self._probability_heap) >= 2 * len(probabilities):  
+            # There is nothing counted yet, or most of the heap is out of date pairs  
+            self._recount_subtrees(probabilities)  
+            return  
+  
+        sign = -1.0 if self.is_white_move else 1.0  
+        changed = itertools.compress(range(len(counted)),  
+                                     map(operator.ne, probabilities, counted))  
+        for i in itertools.chain(changed, range(len(counted), len(probabilities))):  
+            if not self.is_white_move:  
+                self._probability_sum += _to_fixed_point(probabilities[i])  
+                if i < len(counted):  
+                    self._probability_sum -= _to_fixed_point(counted[i])  
+            heapq.heappush(self._probability_heap, (sign * probabilities[i], i))  
+        self._counted_probabilities = probabilities  
+  
+    def _recount_subtrees(self, probabilities: list[float]) -> None:  
+        """Rebuild the sum and heap of subtree white win probabilities from scratch, from the 
+        given white win probabilities of the subtrees. 
+        """  
+        if self.is_white_move:  
+            self._probability_heap = [(-probability, i)  
+                                      for i, probability in enumerate(probabilities)]  
+        else:  
+            self._probability_heap = [(probability, i)  
+                                      for i, probability in enumerate(probabilities)]  
+            self._probability_sum = sum(_to_fixed_point(probability)  
+                                        for probability in probabilities)  
+        heapq.heapify(self._probability_heap)  
+        self._counted_probabilities = probabilities  
+  
+    def _best_index(self) -> int:  
+        """Return the index of the subtree at the top of this tree's heap, discarding out of 
+        date pairs on the way. 
+ 
+        Preconditions: 
+            - len(self.get_subtrees()) >= _AGGREGATE_MIN_SUBTREES 
+            - every subtree has been counted, with self._count_subtrees() 
+        """  
+        heap = self._probability_heap  
+        counted = self._counted_probabilities  
+        sign = -1.0 if self.is_white_move else 1.0  
+        while heap[0][0] != sign * counted[heap[0][1]]:  
+            heapq.heappop(heap)  
+        return heap[0][1]  
   
     def __str__(self) -> str:  
         """Return a string representation of this tree. 
@@ -97,7 +372,8 @@ class GameTree:
     ############################################################################  
     # Part 1: Loading and "Replaying" Minichess games  
     ############################################################################  
-    def insert_move_sequence(self, moves: list[str], white_win_probability: float = 0.0) -> None:  
+    def insert_move_sequence(self, moves: list[Union[str, int]],  
+                             white_win_probability: float = 0.0) -> None:  
         """Insert the given sequence of moves into this tree. 
  
         The inserted moves form a chain of descendants, where: 
@@ -130,7 +406,8 @@ class GameTree:
         self.insert_helper(reversed_moves, white_win_probability)  
         return  
   
-    def insert_helper(self, reversed_moves: list[str], white_win_probability: float) -> None:  
+    def insert_helper(self, reversed_moves: list[Union[str, int]],  
+                      white_win_probability: float) -> None:  
         """ Helper function that makes the recursion calls for insert move sequence. Inserts the 
         move sequence into subtree of the root"""  
         if reversed_moves == []:  
@@ -138,24 +415,94 @@ class GameTree:
   
         else:  
             curr_move = reversed_moves.pop()  
-            subtree = self.find_subtree_by_move(curr_move)  
+            if self._subtrees == []:  
+                index = -1  
+            else:  
+                curr_move = self._move_in_form(curr_move)  
+                index = self._find_subtree_index(curr_move)  
   
-            if subtree is not None:  
-                subtree.insert_helper(reversed_moves, white_win_probability)  
-                self._update_white_win_probability()  
+            if index != -1:  
+                self._subtrees[index].insert_helper(reversed_moves, white_win_probability)  
+                self._subtrees_changed()  
   
             else:  
                 if self.is_white_move:  
-                    new_tree = GameTree(curr_move, False, white_win_probability)  
+                    new_tree = GameTree(curr_move, False, white_win_probability, self.lazy)  
                     new_tree.insert_helper(reversed_moves, white_win_probability)  
                     self.add_subtree(new_tree)  
                     return  
                 else:  
-                    new_tree = GameTree(curr_move, True, white_win_probability)  
+                    new_tree = GameTree(curr_move, True, white_win_probability, self.lazy)  
                     new_tree.insert_helper(reversed_moves, white_win_probability)  
                     self.add_subtree(new_tree)  
                     return  
   
+    def insert_many(self, sequences: Iterable[list[Union[str, int]]],  
+                    probabilities: Optional[Iterable[float]] = None) -> None:  
+        """Insert each of the given sequences of moves into this tree, with the corresponding 
+        white win probability (or 0.0 for all of them, if probabilities is None). 
+ 
+        The result is the same as calling self.insert_move_sequence(moves, probability) for 
+        each sequence in turn, but faster: 
+            - the tree is walked with a loop rather than recursion, so no sequence is too long 
+            - the moves that a sequence shares with the start of the previous sequence are not 
+              walked again 
+            - the white win probability of a tree is only recalculated once the sequences stop 
+              passing through it, rather than once for every sequence that passes through it 
+        Sorting the sequences first saves the most time (every tree is then recalculated 
+        exactly once), although it changes the order that new subtrees are added in. 
+ 
+        Preconditions: 
+            - probabilities is None or it has the same length as sequences 
+        """  
+        if probabilities is None:  
+            probabilities = itertools.repeat(0.0)  
+  
+        # The trees that the previous sequence passed through, starting with this tree  
+        path = [self]  
+        previous_moves = []  
+        inserted_any = False  
+        for moves, white_win_probability in zip(sequences, probabilities):  
+            # Keep the trees for the moves shared with the previous sequence, and finish the rest  
+            shared = 0  
+            most_shared = min(len(moves), len(previous_moves))  
+            while shared < most_shared and moves[shared] == previous_moves[shared]:  
+                shared += 1  
+            while len(path) > shared + 1:  
+                path.pop()._finish_insert_many()  
+  
+            is_new = False  
+            for i in range(shared, len(moves)):  
+                tree = path[-1]  
+                if is_new:  
+                    move, index = moves[i], -1  
+                else:  
+                    move = tree._move_in_form(moves[i])  
+                    index = tree._find_subtree_index(move)  
+                if index == -1:  
+                    subtree = GameTree(move, not tree.is_white_move, white_win_probability,  
+                                       tree.lazy)  
+                    tree._append_subtree(subtree)  
+                    is_new = True  
+                else:  
+                    subtree = tree._subtrees[index]  
+                path.append(subtree)  
+  
+            inserted_any = inserted_any or len(moves) > 0  
+            previous_moves = moves  
+  
+        while len(path) > 1:  
+            path.pop()._finish_insert_many()  
+        if inserted_any:  
+            self._subtrees_changed()  
+  
+    def _finish_insert_many(self) -> None:  
+        """Recalculate the white win probability of this tree, once insert_many has finished 
+        inserting sequences into it (which is nothing to do for a leaf). 
+        """  
+        if self._subtrees != []:  
+            self._subtrees_changed()  
+  
     ############################################################################  
     # Part 2: Complete Game Trees and Win Probabilities  
     ############################################################################  
@@ -174,35 +521,49 @@ class GameTree:
               is equal to the MAXIMUM of the white win probabilities of its subtrees 
             - if self is not a leaf and self.is_white_move is False, the white win probability 
               is equal to the AVERAGE of the white win probabilities of its subtrees 
+ 
+        For a tree with many subtrees, only the subtrees whose white win probabilities have 
+        changed are counted again, in the sum or heap of subtree probabilities that the tree 
+        keeps. See average_probability for how the average is calculated. 
         """  
+        # This sets _white_win_probability rather than the property, since every caller has  
+        # already made sure that this tree isn't marked as out of date  
         if self._subtrees == []:  
             pass  
+        elif len(self._subtrees) < _AGGREGATE_MIN_SUBTREES:  
+            if self.lazy:  
+                probabilities = [subtree.white_win_probability for subtree in self._subtrees]  
+            else:  
+                probabilities = list(map(_get_white_win_probability, self._subtrees))  
+            if self.is_white_move:  
+                self._white_win_probability = max(probabilities)  
+            else:  
+                # The same as average_probability, for so few probabilities  
+                self._white_win_probability = sum(probabilities) / len(probabilities)  
         elif self.is_white_move:  
-            maxi = self.find_max()  
-  
-            self.white_win_probability = maxi  
+            self._count_subtrees()  
+            self._white_win_probability = self._counted_probabilities[self._best_index()]  
         else:  
-            average = self.avg_helper()  
-            self.white_win_probability = average[0] / average[1]  
+            self._count_subtrees()  
+            self._white_win_probability = self._probability_sum / (  
+                len(self._subtrees) << _SUM_FRACTION_BITS)  
   
-    def find_max(self: GameTree, maxi: float = 0.0) -> float:  
+    def find_max(self, maxi: float = 0.0) -> float:  
         """Helper function for _update_white_win_probability. Finds the max value of 
-        white win probability in our subtrees"""  
-  
-        # Base case  
-        max_list = []  
+        white win probability in our subtrees, or the larger of maxi and the white win 
+        probability of this tree if it is a leaf. 
+ 
+        For a White's move tree with many subtrees, this is the top of its heap of subtree 
+        probabilities."""  
         if self._subtrees == []:  
-            if self.white_win_probability > maxi:  
-                return self.white_win_probability  
-            else:  
-                return maxi  
+            return max(self.white_win_probability, maxi)  
+        elif len(self._subtrees) < _AGGREGATE_MIN_SUBTREES or not self.is_white_move:  
+            return max(self._subtree_probabilities())  
         else:  
-            for subtree in self._subtrees:  
-                max_list.append(subtree.white_win_probability)  
-                maxi = max(max_list)  
-            return maxi  
+            self._count_subtrees()  
+            return self._counted_probabilities[self._best_index()]  
   
-    def avg_helper(self: GameTree, total: float = 0, amount: int = 0) -> tuple[float, int]:  
+    def avg_helper(self, total: float = 0, amount: int = 0) -> tuple[float, int]:  
         """Helper function for _update_white_win_probability. Finds the average value of 
         white win probability in our subtrees"""  
         # base case  
@@ -210,12 +571,76 @@ class GameTree:
             return self.white_win_probability, 1  
   
         else:  
-            for subtree in self._subtrees:  
+            for probability in self._subtree_probabilities():  
                 amount += 1  
-                total += subtree.white_win_probability  
+                total += probability  
             return (total, amount)  
   
   
+def find_best_subtree(subtrees: list[GameTree], is_white_move: bool) -> Optional[GameTree]:  
+    """Return the subtree in subtrees with the best white win probability for the player 
+    making the next move (White if is_white_move is True, otherwise Black), like 
+    GameTree.best_subtree, by looking at each of them. Return None if subtrees is empty. 
+ 
+    This is for trees that have the same interface as a GameTree, but don't keep a heap of 
+    their subtree probabilities; subtrees may be a list of any such trees. 
+    """  
+    best = None  
+    for subtree in subtrees:  
+        if best is None:  
+            best = subtree  
+        elif is_white_move and subtree.white_win_probability > best.white_win_probability:  
+            best = subtree  
+        elif not is_white_move and subtree.white_win_probability < best.white_win_probability:  
+            best = subtree  
+    return best  
+  
+  
+def _convert_move(move: Union[str, int]) -> Optional[Union[str, int]]:  
+    """Return the move code of a move in algebraic notation, or the algebraic notation of a 
+    move code. Return None if move is not a Minichess move. 
+    """  
+    if isinstance(move, int):  
+        if 0 <= move <= 255:  
+            return a2_minichess.decode_move(move)  
+        else:  
+            return None  
+  
+    try:  
+        return a2_minichess.encode_move(move)  
+    except KeyError:  
+        return None  
+  
+  
+def average_probability(probabilities: list[float]) -> float:  
+    """Return the average of the given white win probabilities, as used for the white win 
+    probability of a tree that is Black's move. 
+ 
+    For many probabilities, the sum is calculated exactly (as GameTree keeps it for a tree 
+    with many subtrees), so the result is the true average rounded to the nearest float, 
+    whatever the order of probabilities. Otherwise it is added up as floats, in order. 
+ 
+    Preconditions: 
+        - probabilities != [] 
+        - all(0.0 <= p <= 1.0 for p in probabilities) 
+    """  
+    if len(probabilities) < _AGGREGATE_MIN_SUBTREES:  
+        return sum(probabilities) / len(probabilities)  
+  
+    total = sum(_to_fixed_point(probability) for probability in probabilities)  
+    return total / (len(probabilities) << _SUM_FRACTION_BITS)  
+  
+  
+def _to_fixed_point(probability: float) -> int:  
+    """Return probability as a fixed-point number with _SUM_FRACTION_BITS fractional bits. 
+ 
+    Preconditions: 
+        - 0.0 <= probability <= 1.0 
+    """  
+    numerator, denominator = probability.as_integer_ratio()  
+    return numerator << (_SUM_FRACTION_BITS + 1 - denominator.bit_length())  
+  
+  
 if __name__ == '__main__':  
     import python_ta.contracts  
     python_ta.contracts.check_all_contracts()  
@@ -227,4 +652,5 @@ if __name__ == '__main__':
     python_ta.check_all(config={  
         'max-line-length': 100,  
         'disable': ['E1136'],  
+        'extra-imports': ['heapq', 'itertools', 'operator', 'a2_minichess']  
     })  
@@ -0,0 +1,215 @@
+"""A Minichess player that uses Monte Carlo Tree Search (MCTS).
+
+Rather than learning from one complete game at a time, like the ExploringPlayer in a2_part3,
+the player in this module runs many fast random games (playouts) from the current position
+before every move. It grows a GameTree of the positions it has tried, and uses the results
+of the playouts through each node to decide which parts of the tree to explore further.
+"""
+from __future__ import annotations
+import math
+import random
+from typing import Optional
+
+import a2_game_tree
+import a2_minichess
+
+
+class MCTSTree(a2_game_tree.GameTree):
+    """A GameTree grown by Monte Carlo Tree Search.
+
+    The white win probability of each node is the fraction of the playouts through that node
+    that White won, so an MCTSTree can be used anywhere a GameTree can (for example, by a
+    GreedyTreePlayer).
+
+    Instance Attributes:
+      - visits: the number of playouts that have passed through this node
+      - white_wins: the number of those playouts that White won
+
+    Representation Invariants:
+        - 0 <= self.white_wins <= self.visits
+        - self.visits == 0 or self.white_win_probability == self.white_wins / self.visits
+    """
+    visits: int
+    white_wins: int
+
+    # Private Instance Attributes:
+    #   - _untried_moves: the valid moves after this node that don't have a subtree yet (in
+    #       reverse order, so the next one to try is at the end), or None if the valid moves
+    #       haven't been looked at yet
+    _untried_moves: Optional[list[str]]
+
+    def __init__(self, move: str = a2_game_tree.GAME_START_MOVE,
+                 is_white_move: bool = True) -> None:
+        """Initialize a new MCTSTree with no playouts."""
+        super().__init__(move, is_white_move)
+        self.visits = 0
+        self.white_wins = 0
+        self._untried_moves = None
+
+    def is_fully_expanded(self) -> bool:
+        """Return whether every valid move after this node has a subtree.
+
+        This is False for a node that hasn't been expanded yet.
+        """
+        return self._untried_moves == []
+
+    def expand(self, game: a2_minichess.MinichessGame) -> MCTSTree:
+        """Add a subtree for the next valid move after this node that doesn't have one, make
+        that move on game, and return the new subtree.
+
+        Moves are tried in the order of game.get_valid_moves().
+
+        Preconditions:
+            - game is in the position of this node, and is not over
+            - not self.is_fully_expanded()
+        """
+        if self._untried_moves is None:
+            self._untried_moves = list(reversed(game.get_valid_moves()))
+
+        move = self._untried_moves.pop()
+        game.push(move)
+        subtree = MCTSTree(move, game.is_white_move())
+        self.add_subtree(subtree)
+        return subtree
+
+    def record_playout(self, white_won: bool) -> None:
+        """Record the result of a playout through this node."""
+        self.visits += 1
+        if white_won:
+            self.white_wins += 1
+        self.white_win_probability = self.white_wins / self.visits
+
+    def best_subtree(self) -> Optional[MCTSTree]:
+        """Return the subtree with the best playout win rate for the player making the next
+        move, like GameTree.best_subtree.
+
+        Playouts change the win rates of subtrees without going through this tree, so they
+        are looked at one by one rather than kept in a heap.
+        """
+        return a2_game_tree.find_best_subtree(self.get_subtrees(), self.is_white_move)
+
+    def _update_white_win_probability(self) -> None:
+        """Leave the white win probability alone: it is the playout win rate of this node, and
+        is only changed by record_playout.
+        """
+
+
+class MCTSPlayer(a2_minichess.Player):
+    """A Minichess player that chooses its moves using Monte Carlo Tree Search.
+
+    Before each move, this player runs a fixed number of playouts from the current position.
+    Each playout:
+        1. descends its MCTSTree using UCT, which balances choosing moves that have done well
+           for the player making them against trying moves that have few visits
+        2. adds a subtree for one move that hasn't been tried yet
+        3. finishes the game with random moves
+        4. records the result in every node it passed through
+    The player then makes the move with the most visits. The subtree for that move (and then
+    for the opponent's reply) is kept for the next turn, so earlier playouts aren't wasted.
+    """
+    # Private Instance Attributes:
+    #   - _playouts: the number of playouts to run before each move
+    #   - _exploration: the UCT exploration constant
+    #   - _game_tree: the MCTSTree for the current position, or None if there isn't one yet
+    _playouts: int
+    _exploration: float
+    _game_tree: Optional[MCTSTree]
+
+    def __init__(self, playouts: int = 200, exploration: float = math.sqrt(2)) -> None:
+        """Initialize this player.
+
+        Preconditions:
+            - playouts >= 1
+            - exploration >= 0
+        """
+        self._playouts = playouts
+        self._exploration = exploration
+        self._game_tree = None
+
+    def make_move(self, game: a2_minichess.MinichessGame, previous_move: Optional[str]) -> str:
+        """Make a move given the current game.
+
+        previous_move is the opponent player's most recent move, or None if no moves
+        have been made.
+
+        Preconditions:
+            - There is at least one valid move for the given game
+        """
+        if self._game_tree is not None and previous_move is not None:
+            self._game_tree = self._game_tree.find_subtree_by_move(previous_move)
+
+        if self._game_tree is None:
+            root_move = a2_game_tree.GAME_START_MOVE if previous_move is None else previous_move
+            self._game_tree = MCTSTree(root_move, game.is_white_move())
+
+        for _ in range(0, self._playouts):
+            self._run_playout(game)
+
+        best = self._game_tree.get_subtrees()[0]
+        for subtree in self._game_tree.get_subtrees():
+            if subtree.visits > best.visits:
+                best = subtree
+
+        self._game_tree = best
+        return best.move
+
+    def _run_playout(self, game: a2_minichess.MinichessGame) -> None:
+        """Run one playout from game, whose position is self._game_tree.
+
+        game is restored to its original state when this method returns.
+        """
+        node = self._game_tree
+        path = [node]
+        moves_made = 0
+
+        # Selection: descend through nodes whose moves have all been tried
+        while node.is_fully_expanded() and node.get_subtrees() != []:
+            node = self._select_subtree(node)
+            game.push(node.move)
+            moves_made += 1
+            path.append(node)
+
+        # Expansion: add a subtree for one untried move
+        if game.get_winner() is None:
+            path.append(node.expand(game))
+            moves_made += 1
+
+        # Simulation: finish the game randomly
+        while game.get_winner() is None:
+            game.push(random.choice(game.get_valid_move_codes()))
+            moves_made += 1
+
+        white_won = game.get_winner() == 'White'
+        for _ in range(0, moves_made):
+            game.pop()
+
+        # Backpropagation
+        for visited in path:
+            visited.record_playout(white_won)
+
+    def _select_subtree(self, node: MCTSTree) -> MCTSTree:
+        """Return the subtree of node with the highest UCT score for the player to move.
+
+        Preconditions:
+            - node.get_subtrees() != []
+            - all(subtree.visits > 0 for subtree in node.get_subtrees())
+        """
+        log_visits = math.log(node.visits)
+        best, best_score = None, -math.inf
+        for subtree in node.get_subtrees():
+            win_rate = subtree.white_win_probability
+            if not node.is_white_move:
+                win_rate = 1.0 - win_rate
+            score = win_rate + self._exploration * math.sqrt(log_visits / subtree.visits)
+            if score > best_score:
+                best, best_score = subtree, score
+        return best
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['math', 'random', 'a2_game_tree', 'a2_minichess']
+    })
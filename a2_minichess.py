@@ -31,7 +31,8 @@ from __future__ import annotations
 import copy
 import random
 import time
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional, Union
 
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -50,6 +51,33 @@ _INDEX_TO_RANK = {i: r for r, i in _RANK_TO_INDEX.items()}
 
 _MAX_MOVES = 50
 
+# The board is packed into a single 64-bit integer, with 4 bits per square.
+# Square (y, x) is stored in the 4 bits starting at bit 4 * (4 * y + x), so squares appear
+# in the same order as the rows of the 4x4 board (a1, b1, c1, d1, a2, ..., d4).
+# The low 3 bits of a square give the kind of piece on it (0 for an empty square), and
+# the high bit is set if the piece is white.
+_EMPTY = 0
+_WHITE = 8
+_KIND_MASK = 7
+_SQUARE_MASK = 15
+_KIND_TO_CODE = {'p': 1, 'r': 2, 'q': 3, 'k': 4}
+_CODE_TO_KIND = {c: k for k, c in _KIND_TO_CODE.items()}
+_PAWN, _ROOK, _QUEEN, _KING = 1, 2, 3, 4
+_PIECE_VALUES = {_PAWN: 1, _ROOK: 5, _QUEEN: 9}
+
+# Sets of squares are represented as bitboards with the same layout as a packed board, where
+# the lowest bit of each square's 4 bits is set if the square is in the set. This lets a set of
+# squares be extracted from a packed board, and shifted in any direction, with a few operations.
+_ALL_SQUARES = 0x1111111111111111
+_NOT_FILE_A = _ALL_SQUARES & ~0x0001000100010001
+_NOT_FILE_D = _ALL_SQUARES & ~0x1000100010001000
+# A one-square step in a direction is (bitboard << left) >> right, masked to stop pieces
+# wrapping around from one side of the board to the other.
+_ORTHOGONAL_STEPS = ((16, 0, _ALL_SQUARES), (0, 16, _ALL_SQUARES),
+                     (4, 0, _NOT_FILE_A), (0, 4, _NOT_FILE_D))
+_DIAGONAL_STEPS = ((20, 0, _NOT_FILE_A), (12, 0, _NOT_FILE_D),
+                   (0, 12, _NOT_FILE_A), (0, 20, _NOT_FILE_D))
+
 
 class MinichessGame:
     """A class representing a state of a game of Minichess.
@@ -72,67 +100,221 @@ class MinichessGame:
     'https://lichess.org/analysis/standard/8/8/8/8/r1kr4/pqpp4/1PPP4/RQKR4'
     """
     # Private Instance Attributes:
-    #   - _board: a two-dimensional representation of a Minichess board
-    #   - _valid_moves: a list of the valid moves of the current player
+    #   - _board: the Minichess board, packed into an integer with 4 bits per square
+    #             (see the comment above _EMPTY for the layout)
+    #   - _valid_moves: a list of the valid moves of the current player, as move codes
+    #   - _valid_move_names: the valid moves in algebraic notation, or None if they haven't
+    #                        been needed since the valid moves were last calculated
     #   - _is_white_active: a boolean representing whether white is the current player
     #   - _move_count: the number of moves that have been made in the current game
-    _board: list[list[Optional[_Piece]]]
-    _valid_moves: list[str]
+    #   - _zobrist_key: the Zobrist key of the pieces on the board and the player to move
+    #                   (see get_zobrist_key), kept up to date as moves are made
+    #   - _undo_stack: for each move made on this instance (most recent last), a tuple of the
+    #                  move (as it was given to push) and its move code, the code of the piece
+    #                  it captured (_EMPTY if none), and the Zobrist key, move count and valid
+    #                  moves from before the move was made
+    _board: int
+    _valid_moves: list[int]
+    _valid_move_names: Optional[list[str]]
     _is_white_active: bool
     _move_count: int
+    _zobrist_key: int
+    _undo_stack: list[tuple[Union[str, int], int, int, int, int, list[int], Optional[list[str]]]]
 
-    def __init__(self, board: list[list[Optional[_Piece]]] = None,
+    def __init__(self, board: Optional[Union[list[list[Optional[_Piece]]], int]] = None,
                  white_active: bool = True, move_count: int = 0) -> None:
 
-        if board is not None:
+        if board is None:
+            self._board = _INITIAL_BOARD
+        elif isinstance(board, int):
             self._board = board
         else:
-            self._board = [
-                [_Piece('r', True), _Piece('q', True), _Piece('k', True), _Piece('r', True)],
-                [_Piece('p', True), _Piece('p', True), _Piece('p', True), _Piece('p', True)],
-                [_Piece('p', False), _Piece('p', False), _Piece('p', False), _Piece('p', False)],
-                [_Piece('r', False), _Piece('q', False), _Piece('k', False), _Piece('r', False)]
-            ]
+            self._board = _pack_board(board)
 
         self._is_white_active = white_active
         self._move_count = move_count
+        self._zobrist_key = _calculate_zobrist_key(self._board, white_active)
         self._valid_moves = []
+        self._valid_move_names = None
+        self._undo_stack = []
 
         self._recalculate_valid_moves()
 
     def get_valid_moves(self) -> list[str]:
         """Return a list of the valid moves for the active player."""
+        if self._valid_move_names is None:
+            self._valid_move_names = [_MOVE_NAMES[code] for code in self._valid_moves]
+        return self._valid_move_names
+
+    def get_valid_move_codes(self) -> list[int]:
+        """Return a list of the valid moves for the active player, as move codes.
+
+        The moves are in the same order as get_valid_moves. See encode_move for the meaning of
+        a move code.
+
+        >>> game = MinichessGame()
+        >>> game.get_valid_move_codes()
+        [73, 90, 88, 107, 105, 122]
+        """
         return self._valid_moves
 
-    def make_move(self, move: str) -> None:
+    def make_move(self, move: Union[str, int]) -> None:
         """Make the given chess move. This instance of Minichess will be mutated, and will
         afterwards represent the game state after move is made.
 
+        move may be given in algebraic notation or as a move code.
+
         If move is not a currently valid move, raise a ValueError.
         """
-        if move not in self._valid_moves:
-            raise ValueError(f'Move "{move}" is not valid')
+        self.push(move)
+
+    def push(self, move: Union[str, int]) -> None:
+        """Make the given chess move in place, remembering what is needed to undo it with pop.
+
+        This is the same as make_move; moves made with either method can be undone. Walking a
+        game tree with push and pop avoids creating a new MinichessGame for every node.
+
+        If move is not a currently valid move, raise a ValueError.
+
+        >>> game = MinichessGame()
+        >>> game.push('a2b3')
+        >>> game.get_valid_moves()
+        ['b4b3']
+        >>> game.pop()
+        'a2b3'
+        >>> game.get_valid_moves()
+        ['a2b3', 'b2c3', 'b2a3', 'c2d3', 'c2b3', 'd2c3']
+        """
+        code = self._check_move(move)
+
+        captured = (self._board >> ((code & 15) << 2)) & _SQUARE_MASK
+        self._undo_stack.append((move, code, captured, self._zobrist_key, self._move_count,
+                                 self._valid_moves, self._valid_move_names))
 
-        self._board = self._board_after_move(move)
+        self._apply_move(code)
+
+    def pop(self) -> Union[str, int]:
+        """Undo the most recent move made on this game, and return that move (in the same form
+        it was made in).
+
+        The game is restored to exactly the state it was in before the move was made.
+
+        Raise an IndexError if no moves have been made on this game. Note that a game returned
+        by copy_and_make_move starts with no moves to undo.
+        """
+        if self._undo_stack == []:
+            raise IndexError('There are no moves to undo')
+
+        move, code, captured, self._zobrist_key, self._move_count, self._valid_moves, \
+            self._valid_move_names = self._undo_stack.pop()
+
+        start = (code >> 4) << 2
+        end = (code & 15) << 2
+        piece = (self._board >> end) & _SQUARE_MASK
+        board = self._board & ~(_SQUARE_MASK << end)
+        self._board = board | (piece << start) | (captured << end)
 
         self._is_white_active = not self._is_white_active
-        self._move_count += 1
 
-        self._recalculate_valid_moves()
+        return move
 
-    def copy_and_make_move(self, move: str) -> MinichessGame:
+    def copy_and_make_move(self, move: Union[str, int]) -> MinichessGame:
         """Make the given chess move in a copy of this MinichessGame, and return that copy.
 
+        move may be given in algebraic notation or as a move code.
+
         If move is not a currently valid move, raise a ValueError.
         """
-        return MinichessGame(board=self._board_after_move(move),
-                             white_active=not self._is_white_active,
-                             move_count=self._move_count + 1)
+        code = self._check_move(move)
+
+        game = MinichessGame.__new__(MinichessGame)
+        game._board = self._board
+        game._is_white_active = self._is_white_active
+        game._move_count = self._move_count
+        game._zobrist_key = self._zobrist_key
+        game._undo_stack = []
+        game._apply_move(code)
+
+        return game
 
     def is_white_move(self) -> bool:
         """Return whether the white player is to move next."""
         return self._is_white_active
 
+    def get_packed_board(self) -> int:
+        """Return the pieces on the board packed into a single integer, with 4 bits per square.
+
+        Two games have the same pieces on the board exactly when they have the same packed
+        board, and MinichessGame(board=game.get_packed_board()) recreates the board.
+        """
+        return self._board
+
+    def get_move_count(self) -> int:
+        """Return the number of moves that have been made in this game."""
+        return self._move_count
+
+    def get_material_balance(self) -> int:
+        """Return the total value of White's pieces minus the total value of Black's pieces.
+
+        Pawns are worth 1, rooks 5 and queens 9. Kings can never be captured, so they are not
+        counted.
+
+        >>> game = MinichessGame()
+        >>> game.get_material_balance()
+        0
+        >>> game.make_move('a2b3')
+        >>> game.get_material_balance()
+        1
+        """
+        balance = 0
+        for kind, value in _PIECE_VALUES.items():
+            white = bin(_squares_with(self._board, kind | _WHITE)).count('1')
+            black = bin(_squares_with(self._board, kind)).count('1')
+            balance += value * (white - black)
+        return balance
+
+    def get_zobrist_key(self, include_move_count: bool = False) -> int:
+        """Return the Zobrist key of the current position: a 64-bit integer that identifies
+        the pieces on the board and the player to move.
+
+        Equal positions always have equal keys, and different positions almost certainly have
+        different keys. If include_move_count is True, the number of moves made so far is
+        also part of the key, which distinguishes positions that are closer to a draw.
+
+        Keys are the same in every Python process, and are updated incrementally as moves
+        are made, so this never needs to look at the whole board.
+
+        >>> game = MinichessGame()
+        >>> game.make_move('a2b3')
+        >>> game.make_move('b4b3')
+        >>> other = MinichessGame()
+        >>> other.make_move('a2b3')
+        >>> other.get_zobrist_key() == game.get_zobrist_key()
+        False
+        >>> other.make_move('b4b3')
+        >>> other.get_zobrist_key() == game.get_zobrist_key()
+        True
+        """
+        if include_move_count:
+            return self._zobrist_key ^ _ZOBRIST_MOVE_COUNTS[min(self._move_count, _MAX_MOVES)]
+        else:
+            return self._zobrist_key
+
+    def __eq__(self, other: object) -> bool:
+        """Return whether this game is in the same state as other: the same pieces on the
+        board, the same player to move and the same number of moves made.
+        """
+        if not isinstance(other, MinichessGame):
+            return NotImplemented
+
+        return self._board == other._board and \
+            self._is_white_active == other._is_white_active and \
+            self._move_count == other._move_count
+
+    def __hash__(self) -> int:
+        """Return a hash of this game's state, consistent with __eq__."""
+        return hash(self.get_zobrist_key(include_move_count=True))
+
     def get_winner(self) -> Optional[str]:
         """Return the winner of the game (black or white) or 'draw' if the game ended in a draw.
 
@@ -145,122 +327,113 @@ class MinichessGame:
         else:
             return None
 
-    def _calculate_moves_for_board(self, board: list[list[Optional[_Piece]]],
-                                   is_white_active: bool) -> tuple:
-        """Return all possible moves on a given board with a given active player."""
-        moves = []
-        # Used to calculate whether the other players' king is in check
-        # (i.e. the black king if is_white_active, otherwise the white king)
-        check = []
-
-        for pos in [(y, x) for y in range(0, 4) for x in range(0, 4)]:
-            piece = board[pos[0]][pos[1]]
-            if piece is None or piece.is_white != is_white_active:
-                continue
-
-            kind, is_white = piece.kind, piece.is_white
-
-            if kind == 'p':
-                # Pawns can only move towards the opponent's end of the board.
-                direction = 1 if is_white else -1
-
-                check += self._find_moves_in_direction(board, moves, pos, is_white, (direction, 0),
-                                                       limit=1, capture=False)
-                check += self._find_moves_in_direction(board, moves, pos, is_white, (direction, 1),
-                                                       limit=1, capture=True)
-                check += self._find_moves_in_direction(board, moves, pos, is_white, (direction, -1),
-                                                       limit=1, capture=True)
-
-            if kind == 'r' or kind == 'q':
-                check += self._find_moves_in_direction(board, moves, pos, is_white, (0, 1))
-                check += self._find_moves_in_direction(board, moves, pos, is_white, (1, 0))
-                check += self._find_moves_in_direction(board, moves, pos, is_white, (0, -1))
-                check += self._find_moves_in_direction(board, moves, pos, is_white, (-1, 0))
+    def _check_move(self, move: Union[str, int]) -> int:
+        """Return the move code of the given move.
 
-            if kind == 'q':
-                for y, x in [(y, x) for y in [-1, 1] for x in [-1, 1]]:
-                    check += self._find_moves_in_direction(board, moves, pos, is_white, (y, x))
-
-            if kind == 'k':
-                for y, x in [(y, x) for y in [-1, 0, 1] for x in [-1, 0, 1]]:
-                    check += self._find_moves_in_direction(board, moves, pos, is_white, (y, x),
-                                                           limit=1)
+        If move is not a currently valid move, raise a ValueError.
+        """
+        code = _MOVE_CODES.get(move) if isinstance(move, str) else move
+        if code not in self._valid_moves:
+            raise ValueError(f'Move "{move}" is not valid')
 
-        return moves, check
+        return code
 
-    def _find_moves_in_direction(self, board, moves, pos, is_white, direction, limit=None,
-                                 capture=None):
-        """Find valid moves moving in a given direction from a certain position.
+    def _calculate_moves_for_board(self, board: int, is_white_active: bool,
+                                   constraints: tuple[int, int, dict[int, int]]) -> tuple:
+        """Return all valid moves (as move codes) on a given board with a given active player.
 
-        capture: True if must capture, False if must not capture, None otherwise.
+        Moves are looked up in the precomputed move tables (see _build_move_tables), so the
+        only work done here is checking the contents of each target square. Moves that would
+        leave the active player's king in check are filtered out using constraints, which must
+        be the value of _legal_move_constraints(board, is_white_active).
         """
-
-        move_start = _index_to_algebraic(pos)
-        stop = False
-        i = 1
+        moves = []
+        # Used to calculate whether the other players' king is in check
+        # (i.e. the black king if is_white_active, otherwise the white king)
         check = []
-        while not stop:
-            y, x = pos[0] + direction[0] * i, pos[1] + direction[1] * i
-
-            if x < 0 or y < 0 or x > 3 or y > 3:
-                break  # Out of bounds
-
-            contents = board[y][x]
-            move = move_start + _index_to_algebraic((y, x))
-
-            if contents is not None:
-                # Square contains piece
-                stop = True
+        colour = _WHITE if is_white_active else 0
+        enemy_king = _KING | (colour ^ _WHITE)
+        pawn_pushes = _PAWN_PUSHES[is_white_active]
+        pawn_captures = _PAWN_CAPTURES[is_white_active]
+        king_targets, check_targets, pins = constraints
+
+        for square in range(0, 16):
+            code = (board >> (square << 2)) & _SQUARE_MASK
+            if code == _EMPTY or code & _WHITE != colour:
+                continue
 
-                if contents.is_white != is_white and contents.kind == 'k' \
-                        and capture is not False:
-                    # Cannot capture king, but they are in check
-                    check.append(move)
-                elif contents.is_white != is_white and capture is not False:
-                    # Capture
-                    moves.append(move)
+            kind = code & _KIND_MASK
+            start = square << 4
+            if kind == _KING:
+                allowed = king_targets
             else:
-                # Empty square
-                if capture is not True:
-                    moves.append(move)
-
-            i += 1
+                allowed = check_targets & pins.get(square, _ALL_SQUARES)
+
+            if kind == _PAWN:
+                # Pawns can only move towards the opponent's end of the board, and can only
+                # move diagonally when capturing.
+                for target in pawn_pushes[square]:
+                    if (board >> (target << 2)) & _SQUARE_MASK == _EMPTY \
+                            and _SQUARE_BITS[target] & allowed:
+                        moves.append(start | target)
+                for target in pawn_captures[square]:
+                    contents = (board >> (target << 2)) & _SQUARE_MASK
+                    if contents == enemy_king:
+                        check.append(start | target)
+                    elif contents != _EMPTY and contents & _WHITE != colour \
+                            and _SQUARE_BITS[target] & allowed:
+                        moves.append(start | target)
+                continue
 
-            if limit is not None and i > limit:
-                stop = True
+            for ray in _SLIDING_RAYS[kind][square]:
+                for target in ray:
+                    contents = (board >> (target << 2)) & _SQUARE_MASK
+                    if contents == _EMPTY:
+                        if _SQUARE_BITS[target] & allowed:
+                            moves.append(start | target)
+                        continue
+
+                    if contents == enemy_king:
+                        # Cannot capture king, but they are in check
+                        check.append(start | target)
+                    elif contents & _WHITE != colour and _SQUARE_BITS[target] & allowed:
+                        moves.append(start | target)
+                    break
 
-        return check
+        return moves, check
 
-    def _board_after_move(self, move: str) -> list[list[Optional[_Piece]]]:
-        """Return a copy of self._board representing the state of the board after making move.
+    def _apply_move(self, code: int) -> None:
+        """Make the move with the given move code on this game, without checking that it is
+        valid or recording it on the undo stack.
         """
-        board_copy = copy.deepcopy(self._board)
+        start = (code >> 4) << 2
+        end = (code & 15) << 2
+        piece = (self._board >> start) & _SQUARE_MASK
+        captured = (self._board >> end) & _SQUARE_MASK
 
-        start_pos = _algebraic_to_index(move[0:2])
-        end_pos = _algebraic_to_index(move[2:])
+        board = self._board & ~((_SQUARE_MASK << start) | (_SQUARE_MASK << end))
+        self._board = board | (piece << end)
+        self._zobrist_key ^= _ZOBRIST_PIECES[piece][code >> 4] ^ \
+            _ZOBRIST_PIECES[piece][code & 15] ^ _ZOBRIST_PIECES[captured][code & 15] ^ \
+            _ZOBRIST_BLACK_TO_MOVE
 
-        board_copy[end_pos[0]][end_pos[1]] = board_copy[start_pos[0]][start_pos[1]]
-        board_copy[start_pos[0]][start_pos[1]] = None
+        self._is_white_active = not self._is_white_active
+        self._move_count += 1
 
-        return board_copy
+        self._recalculate_valid_moves()
 
     def _recalculate_valid_moves(self) -> None:
         """Update the valid moves for this game board."""
 
-        moves, check = self._calculate_moves_for_board(self._board, self._is_white_active)
+        constraints = _legal_move_constraints(self._board, self._is_white_active)
+        moves, check = self._calculate_moves_for_board(self._board, self._is_white_active,
+                                                       constraints)
 
         assert len(check) == 0, \
             "The other player's king can never be in check at the start of your turn."
 
-        # Filter moves that would leave the current player's king in check
-        valid_moves = []
-        for move in moves:
-            board_copy = self._board_after_move(move)
-            _, check = self._calculate_moves_for_board(board_copy, not self._is_white_active)
-            if len(check) == 0:
-                valid_moves.append(move)
-
-        self._valid_moves = valid_moves
+        self._valid_moves = moves
+        self._valid_move_names = None
 
     def get_fen(self) -> str:
         """Return a string description of the current game state in Forsyth-Edwards Notation.
@@ -270,8 +443,13 @@ class MinichessGame:
         This method is used to visualize the game board using Pygame---you won't need to call it
         directly.
         """
-        rows = [''.join([(p.fen() if p is not None else '1') for p in row]) + '4' for row in
-                self._board]
+        rows = []
+        for y in range(0, 4):
+            row = ''
+            for x in range(0, 4):
+                code = (self._board >> ((y * 4 + x) << 2)) & _SQUARE_MASK
+                row += _code_to_fen(code) if code != _EMPTY else '1'
+            rows.append(row + '4')
         return '/'.join(reversed(rows))
 
     def get_url(self) -> str:
@@ -279,6 +457,30 @@ class MinichessGame:
         return "https://lichess.org/analysis/standard/8/8/8/8/" + self.get_fen()
 
 
+def encode_move(move: str) -> int:
+    """Return the move code of a move given in algebraic notation.
+
+    A move code is an integer between 0 and 255 equal to 16 * start + end, where start and end
+    are the squares the move is from and to, numbered 0 to 15 from a1, b1, c1, d1, a2, ... d4.
+    Move codes are cheaper to store and compare than algebraic notation; MinichessGame
+    accepts either form of move, and get_valid_move_codes returns its valid moves as codes.
+
+    >>> encode_move('a2b3')
+    73
+    >>> decode_move(73)
+    'a2b3'
+    """
+    return _MOVE_CODES[move]
+
+
+def decode_move(code: int) -> str:
+    """Return the algebraic notation of the move with the given move code.
+
+    See encode_move for the meaning of a move code.
+    """
+    return _MOVE_NAMES[code]
+
+
 def _algebraic_to_index(move: str) -> tuple[int, int]:
     """Convert coordinates in algebraic format ex. 'a2' to array indices (y, x)."""
     return (_RANK_TO_INDEX[move[1]], _FILE_TO_INDEX[move[0]])
@@ -289,6 +491,205 @@ def _index_to_algebraic(pos: tuple[int, int]) -> str:
     return _INDEX_TO_FILE[pos[1]] + _INDEX_TO_RANK[pos[0]]
 
 
+def _squares_with(board: int, code: int) -> int:
+    """Return the bitboard of the squares of the packed board that contain the given code."""
+    diff = board ^ (code * _ALL_SQUARES)
+    return ((diff | (diff >> 1) | (diff >> 2) | (diff >> 3)) & _ALL_SQUARES) ^ _ALL_SQUARES
+
+
+def _attacked_squares(board: int, by_white: bool) -> int:
+    """Return the bitboard of the squares attacked by the given player's pieces on board."""
+    colour = _WHITE if by_white else 0
+    occupied = (board | (board >> 1) | (board >> 2) | (board >> 3)) & _ALL_SQUARES
+    empty = occupied ^ _ALL_SQUARES
+
+    pawns = _squares_with(board, _PAWN | colour)
+    if by_white:
+        attacks = ((pawns << 20) & _NOT_FILE_A) | ((pawns << 12) & _NOT_FILE_D)
+    else:
+        attacks = ((pawns >> 12) & _NOT_FILE_A) | ((pawns >> 20) & _NOT_FILE_D)
+
+    king = _squares_with(board, _KING | colour)
+    row = king | ((king << 4) & _NOT_FILE_A) | ((king >> 4) & _NOT_FILE_D)
+    attacks |= (row | (row << 16) | (row >> 16)) & _ALL_SQUARES & ~king
+
+    queens = _squares_with(board, _QUEEN | colour)
+    for sliders, steps in ((_squares_with(board, _ROOK | colour) | queens, _ORTHOGONAL_STEPS),
+                           (queens, _DIAGONAL_STEPS)):
+        for left, right, mask in steps:
+            ray = sliders
+            while ray:
+                ray = ((ray << left) >> right) & mask
+                attacks |= ray
+                ray &= empty
+
+    return attacks
+
+
+def _legal_move_constraints(board: int, is_white: bool) -> tuple[int, int, dict[int, int]]:
+    """Return the squares the given player's pieces may move to on board without leaving
+    their king in check.
+
+    Return a tuple (king_targets, check_targets, pins) of bitboards, where:
+        - king_targets is the set of squares the king may move to, i.e. the squares that are
+          not attacked by the opponent
+        - check_targets is the set of squares any other piece may move to: every square if the
+          king is not in check, the checking piece and the squares between it and the king if
+          the king is in check from one piece, and no squares if it is in check from two
+        - pins maps the square of each piece pinned to the king to the set of squares on the
+          line between the king and the pinning piece (including the pinning piece)
+
+    This is computed once per position, so moves never need to be tried out on a copy of the
+    board to see whether they are legal.
+    """
+    colour = _WHITE if is_white else 0
+    enemy = colour ^ _WHITE
+    king_bit = _squares_with(board, _KING | colour)
+    if king_bit == 0:
+        return _ALL_SQUARES, _ALL_SQUARES, {}
+
+    king = _BIT_TO_SQUARE[king_bit]
+
+    # The king is lifted off the board so that it can't step backwards along the line of a
+    # rook or queen that is checking it.
+    king_targets = _attacked_squares(board & ~(_SQUARE_MASK << (king << 2)), not is_white) \
+        ^ _ALL_SQUARES
+
+    checkers = _PAWN_CAPTURE_BITS[is_white][king] & _squares_with(board, _PAWN | enemy)
+    num_checks = bin(checkers).count('1')
+    check_targets = checkers
+    pins = {}
+
+    for rays, attackers in ((_SLIDING_RAYS[_ROOK][king], {_ROOK | enemy, _QUEEN | enemy}),
+                            (_DIAGONAL_RAYS[king], {_QUEEN | enemy})):
+        for ray in rays:
+            line = 0
+            pinned = None
+            for target in ray:
+                contents = (board >> (target << 2)) & _SQUARE_MASK
+                line |= _SQUARE_BITS[target]
+                if contents == _EMPTY:
+                    continue
+
+                if contents in attackers and pinned is None:
+                    num_checks += 1
+                    check_targets = line
+                elif contents in attackers:
+                    pins[pinned] = line
+                elif pinned is None and contents & _WHITE == colour:
+                    pinned = target
+                    continue
+                break
+
+    if num_checks == 0:
+        check_targets = _ALL_SQUARES
+    elif num_checks > 1:
+        check_targets = 0
+
+    return king_targets, check_targets, pins
+
+
+def _calculate_zobrist_key(board: int, is_white_active: bool) -> int:
+    """Return the Zobrist key of the given packed board and player to move, calculated from
+    scratch.
+    """
+    key = 0 if is_white_active else _ZOBRIST_BLACK_TO_MOVE
+    for square in range(0, 16):
+        key ^= _ZOBRIST_PIECES[(board >> (square << 2)) & _SQUARE_MASK][square]
+    return key
+
+
+def _pack_board(board: list[list[Optional[_Piece]]]) -> int:
+    """Return the packed integer representation of a two-dimensional Minichess board.
+
+    >>> _pack_board([[_Piece('k', True), None, None, None]] + [[None] * 4] * 3)
+    12
+    """
+    packed = 0
+    for y in range(0, 4):
+        for x in range(0, 4):
+            piece = board[y][x]
+            if piece is not None:
+                code = _KIND_TO_CODE[piece.kind] | (_WHITE if piece.is_white else 0)
+                packed |= code << ((y * 4 + x) << 2)
+    return packed
+
+
+def _code_to_fen(code: int) -> str:
+    """Return the FEN character of the piece with the given (non-empty) square code."""
+    kind = _CODE_TO_KIND[code & _KIND_MASK]
+    return kind.upper() if code & _WHITE else kind
+
+
+def _build_move_tables() -> tuple:
+    """Return the move tables of the 4x4 board, which are computed once when this module loads.
+
+    Return a tuple (pawn_pushes, pawn_captures, sliding_rays, move_names) where:
+        - pawn_pushes[is_white][square] is a tuple of the square a pawn can step forward to
+          (empty if the pawn is on the last rank)
+        - pawn_captures[is_white][square] is a tuple of the squares a pawn can capture on
+        - sliding_rays[kind][square] is a tuple of rays for a rook, queen or king, where each
+          ray is a tuple of the squares reached moving outwards in one direction. King rays
+          have length at most 1.
+        - move_names[code] is the algebraic notation of the move with the given move code
+
+    Directions, and the squares within a ray, are listed in the same order that moves have
+    always been generated in, so get_valid_moves returns moves in a consistent order.
+    """
+    def ray(square: int, direction: tuple[int, int], limit: int) -> tuple[int, ...]:
+        targets = []
+        y, x = square >> 2, square & 3
+        for i in range(1, limit + 1):
+            target_y, target_x = y + direction[0] * i, x + direction[1] * i
+            if target_x < 0 or target_y < 0 or target_x > 3 or target_y > 3:
+                break  # Out of bounds
+            targets.append(target_y * 4 + target_x)
+        return tuple(targets)
+
+    straight = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+    diagonal = [(y, x) for y in [-1, 1] for x in [-1, 1]]
+    around = [(y, x) for y in [-1, 0, 1] for x in [-1, 0, 1] if (y, x) != (0, 0)]
+
+    pawn_pushes, pawn_captures = {}, {}
+    for is_white, forward in [(True, 1), (False, -1)]:
+        pawn_pushes[is_white] = [ray(sq, (forward, 0), 1) for sq in range(0, 16)]
+        pawn_captures[is_white] = [ray(sq, (forward, 1), 1) + ray(sq, (forward, -1), 1)
+                                   for sq in range(0, 16)]
+
+    sliding_rays = {
+        _ROOK: [tuple(ray(sq, d, 3) for d in straight if ray(sq, d, 3))
+                for sq in range(0, 16)],
+        _QUEEN: [tuple(ray(sq, d, 3) for d in straight + diagonal if ray(sq, d, 3))
+                 for sq in range(0, 16)],
+        _KING: [tuple(ray(sq, d, 1) for d in around if ray(sq, d, 1))
+                for sq in range(0, 16)]
+    }
+
+    move_names = [_SQUARE_NAMES[code >> 4] + _SQUARE_NAMES[code & 15] for code in range(0, 256)]
+
+    return pawn_pushes, pawn_captures, sliding_rays, move_names
+
+
+_SQUARE_NAMES = [_index_to_algebraic((sq >> 2, sq & 3)) for sq in range(0, 16)]
+_PAWN_PUSHES, _PAWN_CAPTURES, _SLIDING_RAYS, _MOVE_NAMES = _build_move_tables()
+_MOVE_CODES = {name: code for code, name in enumerate(_MOVE_NAMES)}
+_DIAGONAL_RAYS = [tuple(ray for ray in _SLIDING_RAYS[_QUEEN][sq]
+                        if ray not in _SLIDING_RAYS[_ROOK][sq]) for sq in range(0, 16)]
+_SQUARE_BITS = [1 << (sq << 2) for sq in range(0, 16)]
+_BIT_TO_SQUARE = {bit: sq for sq, bit in enumerate(_SQUARE_BITS)}
+_PAWN_CAPTURE_BITS = {is_white: [sum(_SQUARE_BITS[target] for target in targets)
+                                 for targets in _PAWN_CAPTURES[is_white]]
+                      for is_white in [True, False]}
+
+# Random 64-bit numbers for Zobrist hashing. A seeded generator is used so that keys are the
+# same in every process (e.g. so they can be stored on disk). An empty square contributes 0.
+_zobrist_random = random.Random(111)
+_ZOBRIST_PIECES = [[0 if code == _EMPTY else _zobrist_random.getrandbits(64)
+                    for _ in range(0, 16)] for code in range(0, 16)]
+_ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+_ZOBRIST_MOVE_COUNTS = [_zobrist_random.getrandbits(64) for _ in range(0, _MAX_MOVES + 1)]
+
+
 class _Piece:
     """Represents a single piece in Minichess.
 
@@ -315,6 +716,14 @@ class _Piece:
         return self.fen()
 
 
+_INITIAL_BOARD = _pack_board([
+    [_Piece('r', True), _Piece('q', True), _Piece('k', True), _Piece('r', True)],
+    [_Piece('p', True), _Piece('p', True), _Piece('p', True), _Piece('p', True)],
+    [_Piece('p', False), _Piece('p', False), _Piece('p', False), _Piece('p', False)],
+    [_Piece('r', False), _Piece('q', False), _Piece('k', False), _Piece('r', False)]
+])
+
+
 ################################################################################
 # Chess player classes
 ################################################################################
@@ -330,11 +739,24 @@ class Player:
         previous_move is the opponent player's most recent move, or None if no moves
         have been made.
 
+        The returned move may also be a move code (see encode_move); run_game converts it to
+        algebraic notation before passing it on to the other player.
+
         Preconditions:
             - There is at least one valid move for the given game
         """
         raise NotImplementedError
 
+    def copy_for_game(self) -> Player:
+        """Return a copy of this player to play one game, leaving this player unchanged.
+
+        run_games calls this before every game. By default, this player is deep-copied, but
+        a player whose only per-game state is a reference into shared data that it never
+        mutates (like a cursor into a GameTree) can override this to make a much cheaper
+        copy that shares that data.
+        """
+        return copy.deepcopy(self)
+
 
 class RandomPlayer(Player):
     """A Minichess AI whose strategy is always picking a random move."""
@@ -360,28 +782,34 @@ DEFAULT_FPS = 6  # Default number of moves per second to display in the visualiz
 
 def run_games(n: int, white: Player, black: Player,
               visualize: bool = False, fps: int = DEFAULT_FPS,
-              show_stats: bool = False) -> None:
+              show_stats: bool = False, workers: Optional[int] = None,
+              seed: Optional[int] = None) -> None:
     """Run n games using the given Players.
 
     Optional arguments:
         - visualize: whether to use Pygame to visualize the games
         - fps: the number of moves per second to display (only relevant if visualize is True)
         - show_stats: whether to use Plotly to display statistics for the game runs
+        - workers: if not None, play the games in a pool of this many processes. The players
+          must then be picklable, and any changes they make to themselves during a game are
+          lost (as they are anyway, since each game is played by copies of the players).
+        - seed: if not None, seed the random module with seed + i before game i, so that the
+          same seed gives the same results with any number of workers
+
+    The results are printed, and plotted, in game order either way.
 
     Preconditions:
         - n >= 1
         - fps >= 1
+        - workers is None or workers >= 1
+        - not (visualize and workers is not None)
     """
     if visualize:
         _initialize_display()
 
     stats = {'White': 0, 'Black': 0, 'Draw': 0}
     results = []
-    for i in range(0, n):
-        white_copy = copy.deepcopy(white)
-        black_copy = copy.deepcopy(black)
-
-        winner, _ = run_game(white_copy, black_copy, visualize, fps)
+    for i, winner in enumerate(_play_games(n, white, black, visualize, fps, workers, seed)):
         stats[winner] += 1
         results.append(winner)
 
@@ -397,6 +825,49 @@ def run_games(n: int, white: Player, black: Player,
         plot_game_statistics(results)
 
 
+def _play_games(n: int, white: Player, black: Player, visualize: bool, fps: int,
+                workers: Optional[int], seed: Optional[int]) -> Iterator[str]:
+    """Play the games for run_games, and yield their winners in order, as they finish.
+
+    With a process pool, the games are sent to the workers in chunks, so that the players
+    are only pickled once per chunk.
+    """
+    if workers is None:
+        for i in range(0, n):
+            yield from _run_game_range((white, black, i, 1, seed, visualize, fps))
+        return
+
+    chunk_size = max(1, min(1000, n // (workers * 4)))
+    jobs = [(white, black, start, min(chunk_size, n - start), seed, False, fps)
+            for start in range(0, n, chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for winners in executor.map(_run_game_range, jobs):
+            yield from winners
+
+
+def _run_game_range(job: tuple[Player, Player, int, int, Optional[int], bool, int]) \
+        -> list[str]:
+    """Run a range of the games for run_games, and return their winners in order.
+
+    job is a tuple (white, black, start, count, seed, visualize, fps): games start to
+    start + count - 1 are played between copies of white and black. This runs in a worker
+    process when run_games uses a process pool.
+    """
+    white, black, start, count, seed, visualize, fps = job
+    results = []
+    for i in range(start, start + count):
+        if seed is not None:
+            random.seed(seed + i)
+
+        white_copy = white.copy_for_game()
+        black_copy = black.copy_for_game()
+
+        winner, _ = run_game(white_copy, black_copy, visualize, fps)
+        results.append(winner)
+
+    return results
+
+
 def run_game(white: Player, black: Player,
              visualize: bool = False, fps: int = DEFAULT_FPS) -> tuple[str, list[str]]:
     """Run a Minichess game between the two given players.
@@ -412,6 +883,8 @@ def run_game(white: Player, black: Player,
 
         previous_move = current_player.make_move(game, previous_move)
         game.make_move(previous_move)
+        if isinstance(previous_move, int):
+            previous_move = decode_move(previous_move)
         move_sequence.append(previous_move)
 
         if visualize:
@@ -1,37 +1,217 @@
+import copy  
 import csv  
+import gzip  
+import os  
 import random  
-from typing import Optional  
+import time  
+from concurrent.futures import ProcessPoolExecutor  
+from typing import BinaryIO, Iterator, Optional, TextIO  
   
 import a2_game_tree  
 import a2_minichess  
+import a2_tree_cache  
   
   
 ################################################################################  
 # Loading Minichess datasets  
 ################################################################################  
-def load_game_tree(games_file: str) -> a2_game_tree.GameTree:  
+def load_game_tree(games_file: str,  
+                   progress_every: Optional[int] = None) -> a2_game_tree.GameTree:  
     """Create a game tree based on games_file. 
  
+    The games are inserted into the tree as they are read, so no more than one row of the file 
+    is held in memory at a time (on top of the tree itself). games_file may be compressed with 
+    gzip (if its name ends in '.gz') or Zstandard (if its name ends in '.zst', which requires 
+    the zstandard package). 
+ 
+    If progress_every is not None, print a progress message after every progress_every games. 
+ 
     Preconditions: 
         - games_file refers to a csv file in the format described on the assignment handout 
+        - progress_every is None or progress_every >= 1 
  
     Implementation hints: 
         - You can review Tutorial 4 for how we read CSV files in Python. 
     """  
-    list_of_all_moves = []  
     game_tree = a2_game_tree.GameTree('*', True)  
-    with open(games_file) as csv_file:  
+    with _open_games_file(games_file) as csv_file:  
         csv_reader = csv.reader(csv_file)  
-        for row in csv_reader:  
-            list_of_all_moves.append(row)  
+        for games_loaded, sequence in enumerate(csv_reader, 1):  
+            game_tree.insert_move_sequence(sequence)  
+  
+            if progress_every is not None and games_loaded % progress_every == 0:  
+                print(f'Loaded {games_loaded} games from {games_file}')  
+  
+    return game_tree  
+  
+  
+def load_game_tree_parallel(games_file: str, shards: Optional[int] = None,  
+                            max_workers: Optional[int] = None) -> a2_game_tree.GameTree:  
+    """Return the same game tree as load_game_tree(games_file), but build it using a pool of 
+    max_workers processes (by default, one per CPU). 
+ 
+    games_file is split into shards of about the same number of bytes (by default, one per 
+    worker), the games in each shard are loaded into a separate tree in a worker process, and 
+    then the trees are merged here, in file order, with GameTree.merge. 
+ 
+    A compressed games_file can't be split without decompressing it, so it is loaded by 
+    load_game_tree instead. 
+ 
+    Preconditions: 
+        - games_file refers to a csv file in the format described on the assignment handout 
+        - shards is None or shards >= 1 
+        - max_workers is None or max_workers >= 1 
+    """  
+    if games_file.endswith(('.gz', '.zst')):  
+        return load_game_tree(games_file)  
+  
+    if shards is None:  
+        shards = max_workers if max_workers is not None else os.cpu_count()  
+  
+    size = os.path.getsize(games_file)  
+    jobs = [(games_file, size * i // shards, size * (i + 1) // shards) for i in range(0, shards)]  
   
-    # iterate over all move sequences given and return the complete game tree  
-    for sequence in list_of_all_moves:  
-        game_tree.insert_move_sequence(sequence)  
+    game_tree = a2_game_tree.GameTree('*', True)  
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:  
+        for shard_tree in executor.map(_load_shard, jobs):  
+            game_tree.merge(shard_tree)  
   
     return game_tree  
   
   
+def _load_shard(job: tuple[str, int, int]) -> a2_game_tree.GameTree:  
+    """Return the game tree of the games in one shard of a games file. 
+ 
+    job is a tuple (games_file, start, end), as created by load_game_tree_parallel. The shard 
+    is made up of the rows that start at a byte offset in the range [start, end), so that 
+    every row is in exactly one shard however the file is split. 
+    """  
+    games_file, start, end = job  
+    game_tree = a2_game_tree.GameTree('*', True)  
+    with open(games_file, 'rb') as file:  
+        if start > 0:  
+            # Skip the rest of the row that the byte before start is in  
+            file.seek(start - 1)  
+            file.readline()  
+  
+        for sequence in csv.reader(_read_lines(file, end)):  
+            game_tree.insert_move_sequence(sequence)  
+  
+    return game_tree  
+  
+  
+def _read_lines(file: BinaryIO, end: int) -> Iterator[str]:  
+    """Yield the lines of file from its current position, decoded as UTF-8, until a line 
+    starts at or after the byte offset end. 
+    """  
+    while file.tell() < end:  
+        line = file.readline()  
+        if line == b'':  
+            return  
+        yield line.decode('utf-8')  
+  
+  
+class GameLogFollower:  
+    """A follower of games files that are being appended to, which keeps a game tree up to date. 
+ 
+    Each call to refresh inserts only the rows that have been added to the files since the 
+    last call, so the tree never needs to be rebuilt. The tree is updated in place by 
+    insert_move_sequence, so anything holding a reference to it (such as a RandomTreePlayer) 
+    sees the new games and white win probabilities straight away. 
+ 
+    Instance Attributes: 
+      - game_tree: the game tree that new games are inserted into 
+    """  
+    game_tree: a2_game_tree.GameTree  
+  
+    # Private Instance Attributes:  
+    #   - _offsets: a dictionary mapping each games file to a tuple of the (device, inode)  
+    #       pair identifying the file that was read (or None if it hasn't been read yet), and  
+    #       the byte offset of the first row of that file that hasn't been inserted yet  
+    _offsets: dict[str, tuple[Optional[tuple[int, int]], int]]  
+  
+    def __init__(self, games_files: list[str],  
+                 game_tree: Optional[a2_game_tree.GameTree] = None) -> None:  
+        """Initialize a follower of games_files, which inserts games into game_tree (or into a 
+        new, empty game tree if game_tree is None). 
+ 
+        No games are read until refresh is called. 
+        """  
+        self.game_tree = a2_game_tree.GameTree('*', True) if game_tree is None else game_tree  
+        self._offsets = {games_file: (None, 0) for games_file in games_files}  
+  
+    def refresh(self) -> int:  
+        """Insert the rows added to the games files since the last refresh into the game tree, 
+        and return the number of games inserted. 
+ 
+        Only complete rows (ending in a newline) are inserted; a row that is still being 
+        written is left for a later refresh. A file that doesn't exist yet is skipped, and a 
+        file that has been replaced by another file, or has become shorter than the part 
+        already read (because it was truncated), is read again from the start. Inserting a 
+        game that is already in the tree doesn't change it, so games that are read twice this 
+        way do no harm. 
+        """  
+        games_inserted = 0  
+        for games_file, (file_id, offset) in self._offsets.items():  
+            try:  
+                file = open(games_file, 'rb')  
+            except FileNotFoundError:  
+                continue  
+  
+            with file:  
+                status = os.fstat(file.fileno())  
+                if (status.st_dev, status.st_ino) != file_id or status.st_size < offset:  
+                    file_id = (status.st_dev, status.st_ino)  
+                    offset = 0  
+                file.seek(offset)  
+  
+                line = file.readline()  
+                while line.endswith(b'\n'):  
+                    for sequence in csv.reader([line.decode('utf-8')]):  
+                        self.game_tree.insert_move_sequence(sequence)  
+                        games_inserted += 1  
+                    offset += len(line)  
+                    line = file.readline()  
+  
+            self._offsets[games_file] = (file_id, offset)  
+  
+        return games_inserted  
+  
+    def follow(self, interval: float = 1.0, max_refreshes: Optional[int] = None) -> None:  
+        """Refresh the game tree every interval seconds, max_refreshes times (or forever, if 
+        max_refreshes is None). 
+ 
+        Preconditions: 
+            - interval >= 0 
+            - max_refreshes is None or max_refreshes >= 1 
+        """  
+        refreshes = 0  
+        while max_refreshes is None or refreshes < max_refreshes:  
+            self.refresh()  
+            refreshes += 1  
+            if max_refreshes is None or refreshes < max_refreshes:  
+                time.sleep(interval)  
+  
+  
+def _open_games_file(games_file: str) -> TextIO:  
+    """Open games_file for reading as text, decompressing it if its name ends in '.gz' (gzip) 
+    or '.zst' (Zstandard). 
+ 
+    Raise an ImportError if games_file is Zstandard-compressed and the zstandard package is 
+    not installed. 
+    """  
+    if games_file.endswith('.gz'):  
+        return gzip.open(games_file, 'rt', newline='')  
+    elif games_file.endswith('.zst'):  
+        try:  
+            import zstandard  
+        except ImportError:  
+            raise ImportError(f'The zstandard package is needed to read {games_file}') from None  
+        return zstandard.open(games_file, 'rt', newline='')  
+    else:  
+        return open(games_file, newline='')  
+  
+  
 ################################################################################  
 # Minichess AI that uses a GameTree  
 ################################################################################  
@@ -62,6 +242,14 @@ class RandomTreePlayer(a2_minichess.Player):
         """  
         self._game_tree = game_tree  
   
+    def copy_for_game(self) -> a2_minichess.Player:  
+        """Return a copy of this player to play one game, leaving this player unchanged. 
+ 
+        This player never mutates its game tree, so the copy shares it, and only has its own 
+        reference to the current subtree. 
+        """  
+        return copy.copy(self)  
+  
     def make_move(self, game: a2_minichess.MinichessGame, previous_move: Optional[str]) -> str:  
         """Make a move given the current game. 
  
@@ -72,15 +260,7 @@ class RandomTreePlayer(a2_minichess.Player):
             - There is at least one valid move for the given game 
         """  
         if previous_move is not None and self._game_tree is not None:  
-            existing_move = False  
-  
-            for subtree in self._game_tree.get_subtrees():  
-                if previous_move == subtree.move:  
-                    self._game_tree = subtree  
-                    existing_move = True  
-                    break  
-            if not existing_move:  
-                self._game_tree = None  
+            self._game_tree = self._game_tree.find_subtree_by_move(previous_move)  
   
         if self._game_tree is None or self._game_tree.get_subtrees() == []:  
             possible_moves = game.get_valid_moves()  
@@ -92,13 +272,17 @@ class RandomTreePlayer(a2_minichess.Player):
             return new_tree.move  
   
   
-def part1_runner(games_file: str, n: int, black_random: bool) -> None:  
+def part1_runner(games_file: str, n: int, black_random: bool,  
+                 cache_dir: Optional[str] = None) -> None:  
     """Create a game tree from the given file, and run n games where White is a RandomTreePlayer. 
  
     The White player is a RandomTreePlayer whose game tree is the one generated from games_file. 
     The Black player is a RandomPlayer if black_random is True, otherwise it is a RandomTreePlayer 
     using the SAME game tree as White. 
  
+    If cache_dir is not None, the game tree is kept in an a2_tree_cache.TreeCache in that 
+    directory, so it is only loaded from games_file again when the file has changed. 
+ 
     Precondtions: 
         - n >= 1 
         - games_file refers to a csv file in the format described on the assignment handout 
@@ -107,13 +291,18 @@ def part1_runner(games_file: str, n: int, black_random: bool) -> None:
         - Your implementation MUST correctly call a2_minichess.run_games. You may choose 
           the values for the optional arguments passed to the function. 
     """  
-    white_player = RandomTreePlayer(load_game_tree(games_file))  
+    if cache_dir is None:  
+        game_tree = load_game_tree(games_file)  
+    else:  
+        game_tree = a2_tree_cache.TreeCache(cache_dir).get_game_tree(games_file, load_game_tree)  
+  
+    white_player = RandomTreePlayer(game_tree)  
   
     if black_random:  
         black_player = a2_minichess.RandomPlayer()  
   
     else:  
-        black_player = RandomTreePlayer(load_game_tree(games_file))  
+        black_player = RandomTreePlayer(game_tree)  
   
     a2_minichess.run_games(n, white_player, black_player)  
   
@@ -123,8 +312,10 @@ if __name__ == '__main__':
     python_ta.check_all(config={  
         'max-line-length': 100,  
         'disable': ['E1136'],  
-        'extra-imports': ['a2_minichess', 'a2_game_tree', 'random', 'csv'],  
-        'allowed-io': ['load_game_tree']  
+        'extra-imports': ['a2_minichess', 'a2_game_tree', 'random', 'csv', 'copy', 'gzip',  
+                          'os', 'time', 'concurrent.futures', 'zstandard', 'a2_tree_cache'],  
+        'allowed-io': ['load_game_tree', '_report_progress', '_open_games_file', '_load_shard',  
+                       'GameLogFollower.refresh']  
     })  
   
     # Sample call to part1_runner (you can change this, just keep it in the main block!)  
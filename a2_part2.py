@@ -1,8 +1,11 @@
+import copy  
 import random  
+from concurrent.futures import ProcessPoolExecutor  
 from typing import Optional  
   
 import a2_game_tree  
 import a2_minichess  
+import a2_tree_cache  
   
   
 def generate_complete_game_tree(root_move: str, game_state: a2_minichess.MinichessGame,  
@@ -27,8 +30,10 @@ def generate_complete_game_tree(root_move: str, game_state: a2_minichess.Miniche
  
     Implementation hints: 
         - This function must be implemented recursively. 
-        - In the recursive step, use the MinichessGame.copy_and_make_move method to create 
-          a copy of the game state with one new move made. 
+        - In the recursive step, use the MinichessGame.push method to make each move in place, 
+          and MinichessGame.pop to undo it once its subtree has been generated. This avoids 
+          creating a new MinichessGame for every node, and leaves game_state unchanged when 
+          this function returns. 
         - You'll need to review the public interface of the MinichessGame class to see what 
           methods are available to help implement this function. 
  
@@ -44,11 +49,111 @@ def generate_complete_game_tree(root_move: str, game_state: a2_minichess.Miniche
   
     else:  
         for move in game_state.get_valid_moves():  
-            this_game_state = game_state.copy_and_make_move(move)  
-            game_tree.add_subtree(generate_complete_game_tree(move, this_game_state, d - 1))  
+            game_state.push(move)  
+            game_tree.add_subtree(generate_complete_game_tree(move, game_state, d - 1))  
+            game_state.pop()  
         return game_tree  
   
   
+def generate_complete_game_tree_parallel(  
+        root_move: str, game_state: a2_minichess.MinichessGame, d: int,  
+        max_workers: Optional[int] = None) -> a2_game_tree.GameTree:  
+    """Return the same GameTree as generate_complete_game_tree(root_move, game_state, d), but 
+    generate it using a pool of max_workers processes (by default, one per CPU). 
+ 
+    The subtrees two moves below the root are generated in the worker processes, and then 
+    joined together here into one tree, with the same subtree order and white win 
+    probabilities as generate_complete_game_tree. 
+ 
+    Preconditions: 
+        - d >= 0 
+        - root_move == GAME_START_MOVE or root_move is a valid chess move 
+        - if root_move == GAME_START_MOVE, then game_state is in the initial game state 
+        - max_workers is None or max_workers >= 1 
+    """  
+    if d < 2:  
+        return generate_complete_game_tree(root_move, game_state, d)  
+  
+    # The move sequences (of length 2) whose subtrees are generated by the worker processes  
+    jobs = []  
+    for move in game_state.get_valid_moves():  
+        game_state.push(move)  
+        jobs.extend([(game_state, [move, reply], d - 2) for reply in game_state.get_valid_moves()])  
+        game_state.pop()  
+  
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:  
+        subtrees = iter(list(executor.map(_generate_subtree_after_moves, jobs)))  
+  
+    game_tree = a2_game_tree.GameTree(root_move, game_state.is_white_move())  
+    for move in game_state.get_valid_moves():  
+        game_state.push(move)  
+        if game_state.get_valid_moves() == []:  
+            subtree = generate_complete_game_tree(move, game_state, d - 1)  
+        else:  
+            subtree = a2_game_tree.GameTree(move, game_state.is_white_move())  
+            for _ in game_state.get_valid_moves():  
+                subtree.add_subtree(next(subtrees))  
+        game_tree.add_subtree(subtree)  
+        game_state.pop()  
+  
+    return game_tree  
+  
+  
+def _generate_subtree_after_moves(  
+        job: tuple[a2_minichess.MinichessGame, list[str], int]) -> a2_game_tree.GameTree:  
+    """Return the complete game tree of the given depth after making the given moves. 
+ 
+    job is a tuple (game_state, moves, d), as created by generate_complete_game_tree_parallel. 
+    This runs in a worker process, so it is free to mutate its copy of game_state. 
+    """  
+    game_state, moves, d = job  
+    for move in moves:  
+        game_state.push(move)  
+    return generate_complete_game_tree(moves[-1], game_state, d)  
+  
+  
+def evaluate_game_state(game_state: a2_minichess.MinichessGame, d: int) -> float:  
+    """Return the white win probability of the root of 
+    generate_complete_game_tree(GAME_START_MOVE, game_state, d), without building the tree. 
+ 
+    The tree is searched depth-first using MinichessGame.push and MinichessGame.pop, applying 
+    the same rule as GameTree._update_white_win_probability on the way back up. Only the 
+    current path is kept in memory, so this can evaluate depths whose complete game tree 
+    would not fit in memory. game_state is unchanged when this function returns. 
+ 
+    Preconditions: 
+        - d >= 0 
+    """  
+    if game_state.get_winner() == 'White':  
+        return 1.0  
+    elif d == 0 or game_state.get_valid_moves() == []:  
+        return 0.0  
+  
+    probabilities = evaluate_moves(game_state, d)  
+    if game_state.is_white_move():  
+        return max(probabilities)  
+    else:  
+        return a2_game_tree.average_probability(probabilities)  
+  
+  
+def evaluate_moves(game_state: a2_minichess.MinichessGame, d: int) -> list[float]:  
+    """Return the white win probabilities of the subtrees of the root of 
+    generate_complete_game_tree(GAME_START_MOVE, game_state, d), without building the tree. 
+ 
+    The returned probabilities are in the same order as game_state.get_valid_moves(). See 
+    evaluate_game_state for details. 
+ 
+    Preconditions: 
+        - d >= 1 
+    """  
+    probabilities = []  
+    for move in game_state.get_valid_moves():  
+        game_state.push(move)  
+        probabilities.append(evaluate_game_state(game_state, d - 1))  
+        game_state.pop()  
+    return probabilities  
+  
+  
 class GreedyTreePlayer(a2_minichess.Player):  
     """A Minichess player that plays greedily based on a given GameTree. 
  
@@ -68,6 +173,14 @@ class GreedyTreePlayer(a2_minichess.Player):
         """  
         self._game_tree = game_tree  
   
+    def copy_for_game(self) -> a2_minichess.Player:  
+        """Return a copy of this player to play one game. 
+ 
+        The game tree is only ever read, so the copy shares it instead of copying it; moving 
+        the copy's current subtree doesn't affect this player. 
+        """  
+        return copy.copy(self)  
+  
     def make_move(self, game: a2_minichess.MinichessGame, previous_move: Optional[str]) -> str:  
         """Make a move given the current game. 
  
@@ -79,43 +192,24 @@ class GreedyTreePlayer(a2_minichess.Player):
         """  
         if previous_move is None:  
             # White chooses best opening move  
-            temp_subtree = self._game_tree.get_subtrees()[0]  
-            for subtree in self._game_tree.get_subtrees():  
-                if subtree.white_win_probability > temp_subtree.white_win_probability:  
-                    temp_subtree = subtree  
-            self._game_tree = temp_subtree  
-            return temp_subtree.move  
-  
-        white_move = game.is_white_move()  
-        for subtree in self._game_tree.get_subtrees():  
-            if previous_move == subtree.move:  
-                self._game_tree = subtree  
-                break  
-  
-        if self._game_tree is not None and self._game_tree.get_subtrees() != [] and white_move:  
-            # white turn  
-            temp_subtree = self._game_tree.get_subtrees()[0]  
-            for subtree in self._game_tree.get_subtrees():  
-                if subtree.white_win_probability > temp_subtree.white_win_probability:  
-                    temp_subtree = subtree  
-            self._game_tree = temp_subtree  
-            return temp_subtree.move  
-  
-        elif self._game_tree is not None and self._game_tree.get_subtrees() != []:  
-            # black turn  
-            temp_subtree = self._game_tree.get_subtrees()[0]  
-            for subtree in self._game_tree.get_subtrees():  
-                if subtree.white_win_probability < temp_subtree.white_win_probability:  
-                    temp_subtree = subtree  
-            self._game_tree = temp_subtree  
-            return temp_subtree.move  
+            self._game_tree = self._game_tree.best_subtree()  
+            return self._game_tree.move  
+  
+        subtree = self._game_tree.find_subtree_by_move(previous_move)  
+        if subtree is not None:  
+            self._game_tree = subtree  
+  
+        if self._game_tree is not None and self._game_tree.get_subtrees() != []:  
+            # best move for the player to move: highest probability for white, lowest for black  
+            self._game_tree = self._game_tree.best_subtree()  
+            return self._game_tree.move  
   
         else:  
             # random player ai  
             return random.choice(game.get_valid_moves())  
   
   
-def part2_runner(d: int, n: int, white_greedy: bool) -> None:  
+def part2_runner(d: int, n: int, white_greedy: bool, cache_dir: Optional[str] = None) -> None:  
     """Create a complete game tree with the given depth, and run n games where 
     one player is a GreedyTreePlayer and the other is a RandomPlayer. 
  
@@ -123,6 +217,9 @@ def part2_runner(d: int, n: int, white_greedy: bool) -> None:
     If white_greedy is True, the White player is the GreedyTreePlayer and Black is a RandomPlayer. 
     This is switched when white_greedy is False. 
  
+    If cache_dir is not None, the complete game tree is kept in an a2_tree_cache.TreeCache in 
+    that directory, so it is only generated the first time each depth is used. 
+ 
     Precondtions: 
         - d >= 0 
         - n >= 1 
@@ -132,11 +229,17 @@ def part2_runner(d: int, n: int, white_greedy: bool) -> None:
           the values for the optional arguments passed to the function. 
     """  
     game = a2_minichess.MinichessGame()  
+    if cache_dir is None:  
+        game_tree = generate_complete_game_tree('*', game, d)  
+    else:  
+        game_tree = a2_tree_cache.TreeCache(cache_dir).get_complete_game_tree(  
+            '*', game, d, generate_complete_game_tree)  
+  
     if white_greedy:  
-        white_player = GreedyTreePlayer(generate_complete_game_tree('*', game, d))  
+        white_player = GreedyTreePlayer(game_tree)  
         black_player = a2_minichess.RandomPlayer()  
     else:  
-        black_player = GreedyTreePlayer(generate_complete_game_tree('*', game, d))  
+        black_player = GreedyTreePlayer(game_tree)  
         white_player = a2_minichess.RandomPlayer()  
   
     a2_minichess.run_games(n, white_player, black_player)  
@@ -148,7 +251,8 @@ if __name__ == '__main__':
         'max-line-length': 100,  
         'max-nested-blocks': 4,  
         'disable': ['E1136'],  
-        'extra-imports': ['random', 'a2_minichess', 'a2_game_tree']  
+        'extra-imports': ['copy', 'random', 'concurrent.futures', 'a2_minichess', 'a2_game_tree',  
+                          'a2_tree_cache']  
     })  
   
     # Sample call to part2_runner (you can change this, just keep it in the main block!)  
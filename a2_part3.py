@@ -1,3 +1,4 @@
+import copy  
 import random  
 from typing import Optional  
   
@@ -22,6 +23,13 @@ class ExploringPlayer(a2_minichess.Player):
         self._game_tree = game_tree  
         self._exploration_probability = exploration_probability  
   
+    def copy_for_game(self) -> a2_minichess.Player:  
+        """Return a copy of this player to play one game, sharing (not copying) its game tree. 
+ 
+        Like a GreedyTreePlayer, this player only reads its game tree. 
+        """  
+        return copy.copy(self)  
+  
     def make_move(self, game: a2_minichess.MinichessGame, previous_move: Optional[str]) -> str:  
         """Make a move given the current game. 
  
@@ -45,22 +53,9 @@ class ExploringPlayer(a2_minichess.Player):
             return random.choice(game.get_valid_moves())  
   
         else:  
-            if game.is_white_move():  
-                temp_subtree = self._game_tree.get_subtrees()[0]  
-                for subtree in self._game_tree.get_subtrees():  
-                    if subtree.white_win_probability > temp_subtree.white_win_probability:  
-                        temp_subtree = subtree  
-                self._game_tree = temp_subtree  
-                return temp_subtree.move  
-  
-            else:  
-                temp_subtree = self._game_tree.get_subtrees()[0]  
-                for subtree in self._game_tree.get_subtrees():  
-                    if subtree.white_win_probability < temp_subtree.white_win_probability:  
-                        temp_subtree = subtree  
-                self._game_tree = temp_subtree  
-  
-                return temp_subtree.move  
+            # Play greedily: the highest probability for white, the lowest for black  
+            self._game_tree = self._game_tree.best_subtree()  
+            return self._game_tree.move  
   
   
 def run_learning_algorithm(exploration_probabilities: list[float],  
@@ -92,8 +87,9 @@ def run_learning_algorithm(exploration_probabilities: list[float],
           white_win_probability of its nodes, calculate its size, or and use it in a 
           RandomTreePlayer or GreedyTreePlayer to see how they do with it. 
     """  
-    # Start with a GameTree in the initial state  
-    game_tree = a2_game_tree.GameTree()  
+    # Start with a GameTree in the initial state. It is lazy, since many games are inserted  
+    # into it, but the players only read the probabilities along the paths they take.  
+    game_tree = a2_game_tree.GameTree(lazy=True)  
   
     # Play games using the GreedyRandomPlayer and update the GameTree after each one  
     results_so_far = []  
@@ -101,7 +97,7 @@ def run_learning_algorithm(exploration_probabilities: list[float],
     # Write your loop here, according to the description above.  
     for i in exploration_probabilities:  
         # make a copy of game_tree  
-        temp_game_tree = a2_game_tree.GameTree()  
+        temp_game_tree = a2_game_tree.GameTree(lazy=True)  
         for subtree in game_tree.get_subtrees():  
             temp_game_tree.add_subtree(subtree)  
   
@@ -141,7 +137,7 @@ if __name__ == '__main__':
         'max-line-length': 100,  
         'max-nested-blocks': 4,  
         'disable': ['E1136'],  
-        'extra-imports': ['random', 'a2_minichess', 'a2_game_tree'],  
+        'extra-imports': ['copy', 'random', 'a2_minichess', 'a2_game_tree'],  
         'allowed-io': ['run_learning_algorithm']  
     })  
   
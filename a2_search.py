@@ -0,0 +1,234 @@
+"""Minichess players that search the game directly, instead of using a pre-built GameTree.
+
+A complete GameTree is only practical to a depth of about 6 moves. The players in this module
+search MinichessGame states with MinichessGame.push and MinichessGame.pop, keeping only the
+current line of play (plus a bounded table of results) in memory, so they can look much
+further ahead within a per-move budget.
+"""
+from __future__ import annotations
+import time
+from typing import Optional
+
+import a2_minichess
+
+# The score of a won position, from the point of view of the player to move. Wins are scored as
+# _WIN minus the number of moves made in the game, so that faster wins score higher.
+_WIN = 1000
+# Scores above this are forced wins; no material balance can come close to it
+_WIN_THRESHOLD = _WIN // 2
+
+# The kinds of bound a transposition table entry's score can be
+_EXACT, _LOWER_BOUND, _UPPER_BOUND = 0, 1, 2
+
+
+class _SearchBudgetExceeded(Exception):
+    """Raised inside a search when its time or node budget has run out."""
+
+
+class AlphaBetaPlayer(a2_minichess.Player):
+    """A Minichess player that chooses its moves with an alpha-beta (negamax) search.
+
+    On each turn, this player searches to depth 1, 2, 3, ... (iterative deepening) until its
+    per-move time or node budget runs out, and plays the best move found by the deepest
+    search that finished. Positions at the search horizon are scored by their material balance
+    (see MinichessGame.get_material_balance), and won positions are scored higher the sooner
+    they are reached.
+
+    To make alpha-beta pruning as effective as possible, moves are tried in order of:
+        1. the best move found for the position by an earlier search
+           (stored in a transposition table, keyed by Zobrist key)
+        2. how often the move has caused a cutoff elsewhere in the search (history heuristic)
+        3. the order of MinichessGame.get_valid_moves
+    The transposition table is kept from one move to the next, but is cleared if it grows
+    past max_table_size entries.
+    """
+    # Private Instance Attributes:
+    #   - _time_limit: the maximum number of seconds to search for each move, or None
+    #   - _node_limit: the maximum number of positions to search for each move, or None
+    #   - _max_depth: the maximum depth to search to
+    #   - _max_table_size: the maximum number of entries in the transposition table
+    #   - _table: the transposition table, mapping the Zobrist key (including the move count)
+    #       of a searched position to a tuple (depth, score, bound, best move code)
+    #   - _history: the history heuristic score of each move code
+    #   - _nodes: the number of positions visited by the current search
+    #   - _deadline: the time (from time.perf_counter) the current search must stop by, or None
+    _time_limit: Optional[float]
+    _node_limit: Optional[int]
+    _max_depth: int
+    _max_table_size: int
+    _table: dict[int, tuple[int, int, int, Optional[int]]]
+    _history: list[int]
+    _nodes: int
+    _deadline: Optional[float]
+
+    def __init__(self, time_limit: Optional[float] = 1.0, node_limit: Optional[int] = None,
+                 max_depth: int = 50, max_table_size: int = 1_000_000) -> None:
+        """Initialize this player.
+
+        time_limit is the number of seconds to search for each move, and node_limit is the
+        number of positions to search for each move; either can be None for no limit.
+
+        Preconditions:
+            - time_limit is None or time_limit > 0
+            - node_limit is None or node_limit >= 1
+            - time_limit is not None or node_limit is not None or max_depth <= 10
+            - max_depth >= 1
+            - max_table_size >= 1
+        """
+        self._time_limit = time_limit
+        self._node_limit = node_limit
+        self._max_depth = max_depth
+        self._max_table_size = max_table_size
+        self._table = {}
+        self._history = [0] * 256
+        self._nodes = 0
+        self._deadline = None
+
+    def make_move(self, game: a2_minichess.MinichessGame, previous_move: Optional[str]) -> str:
+        """Make a move given the current game.
+
+        previous_move is the opponent player's most recent move, or None if no moves
+        have been made.
+
+        Preconditions:
+            - There is at least one valid move for the given game
+        """
+        self._nodes = 0
+        if self._time_limit is None:
+            self._deadline = None
+        else:
+            self._deadline = time.perf_counter() + self._time_limit
+
+        best_move = game.get_valid_move_codes()[0]
+        for depth in range(1, self._max_depth + 1):
+            try:
+                best_move, score = self._search_root(game, depth, best_move)
+            except _SearchBudgetExceeded:
+                break
+
+            if abs(score) > _WIN_THRESHOLD:
+                break  # The result of the game is already decided
+
+        return a2_minichess.decode_move(best_move)
+
+    def _search_root(self, game: a2_minichess.MinichessGame, depth: int,
+                     first_move: int) -> tuple[int, int]:
+        """Search game to the given depth, and return a tuple of the best move code and its
+        score. first_move is searched first.
+        """
+        moves = self._order_moves(game.get_valid_move_codes(), first_move)
+        alpha = -_WIN - 1
+        best_move = moves[0]
+        for move in moves:
+            game.push(move)
+            try:
+                score = -self._negamax(game, depth - 1, -_WIN - 1, -alpha)
+            finally:
+                game.pop()
+
+            if score > alpha:
+                alpha = score
+                best_move = move
+
+        self._store(game.get_zobrist_key(include_move_count=True), depth, alpha, _EXACT,
+                    best_move)
+        return best_move, alpha
+
+    def _negamax(self, game: a2_minichess.MinichessGame, depth: int, alpha: int,
+                 beta: int) -> int:
+        """Return the score of game for the player to move, searched to the given depth.
+
+        The returned score is exact if it is strictly between alpha and beta. Otherwise, it is
+        an upper bound (if <= alpha) or a lower bound (if >= beta) on the exact score.
+
+        Raise _SearchBudgetExceeded if the search runs out of time or nodes. game is restored
+        to its original state either way.
+        """
+        self._nodes += 1
+        self._check_budget()
+
+        winner = game.get_winner()
+        if winner == 'Draw':
+            return 0
+        elif winner is not None:
+            # The player to move has no valid moves, and has lost
+            return game.get_move_count() - _WIN
+        elif depth == 0:
+            balance = game.get_material_balance()
+            return balance if game.is_white_move() else -balance
+
+        key = game.get_zobrist_key(include_move_count=True)
+        entry = self._table.get(key)
+        table_move = None
+        if entry is not None:
+            entry_depth, score, bound, table_move = entry
+            if entry_depth >= depth and (bound == _EXACT
+                                         or (bound == _LOWER_BOUND and score >= beta)
+                                         or (bound == _UPPER_BOUND and score <= alpha)):
+                return score
+
+        original_alpha = alpha
+        best_score = -_WIN - 1
+        best_move = None
+        for move in self._order_moves(game.get_valid_move_codes(), table_move):
+            game.push(move)
+            try:
+                score = -self._negamax(game, depth - 1, -beta, -alpha)
+            finally:
+                game.pop()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self._history[move] += depth * depth
+                break
+
+        if best_score <= original_alpha:
+            bound = _UPPER_BOUND
+        elif best_score >= beta:
+            bound = _LOWER_BOUND
+        else:
+            bound = _EXACT
+        self._store(key, depth, best_score, bound, best_move)
+
+        return best_score
+
+    def _order_moves(self, moves: list[int], first_move: Optional[int]) -> list[int]:
+        """Return moves in the order they should be searched: first_move (if it is one of
+        moves), then by decreasing history score.
+        """
+        ordered = sorted(moves, key=self._history.__getitem__, reverse=True)
+        if first_move is not None and first_move in moves:
+            ordered.remove(first_move)
+            ordered.insert(0, first_move)
+        return ordered
+
+    def _store(self, key: int, depth: int, score: int, bound: int,
+               best_move: Optional[int]) -> None:
+        """Store the result of searching a position in the transposition table."""
+        if len(self._table) >= self._max_table_size:
+            self._table.clear()
+        self._table[key] = (depth, score, bound, best_move)
+
+    def _check_budget(self) -> None:
+        """Raise _SearchBudgetExceeded if the current search has run out of time or nodes.
+
+        The clock is only checked every 256 nodes.
+        """
+        if self._node_limit is not None and self._nodes > self._node_limit:
+            raise _SearchBudgetExceeded
+        if self._deadline is not None and self._nodes % 256 == 0 \
+                and time.perf_counter() > self._deadline:
+            raise _SearchBudgetExceeded
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['time', 'a2_minichess']
+    })
@@ -0,0 +1,325 @@
+"""A Minichess tablebase: the exact result of every position reachable from a starting position.
+
+Every Minichess game ends within _MAX_MOVES moves, and the number of moves made can only go
+up. So the positions reachable from a starting position can be split into layers by their
+move count, and solved by retrograde analysis: the last layer is all draws, and each earlier
+layer is solved from the one after it.
+
+The results are stored on disk as an open-addressing hash table keyed by Zobrist key
+(including the move count), which is opened with mmap. Looking up a position therefore takes
+constant time, and opening a tablebase doesn't read it into memory.
+
+File format (all integers little-endian):
+    - header: the magic bytes b'MCTBASE1', then the table capacity and number of entries
+      as unsigned 64-bit integers
+    - capacity unsigned 64-bit Zobrist keys (0 marks an empty slot)
+    - capacity result bytes, where the top 2 bits are one of _DRAW, _WIN and _LOSS (for the
+      player to move) and the low 6 bits are the number of moves until the game ends with
+      best play
+"""
+from __future__ import annotations
+import bisect
+import copy
+import mmap
+import os
+import random
+import struct
+import sys
+from array import array
+from typing import Iterator, Optional
+
+import a2_minichess
+
+_MAGIC = b'MCTBASE1'
+_HEADER = struct.Struct('<8sQQ')
+_KEY = struct.Struct('<Q')
+
+# The possible results of a position, for the player to move
+_DRAW, _WIN, _LOSS = 0, 1, 2
+
+
+def solve(game_state: Optional[a2_minichess.MinichessGame] = None) \
+        -> Iterator[tuple[int, int]]:
+    """Solve every position reachable from game_state (the initial state if None), and yield
+    a tuple (key, result) for each one.
+
+    key is the position's Zobrist key, including the move count, and result is its result
+    byte (see the module docstring). Results are yielded from the last layer backwards.
+
+    Only the packed boards of each layer, and the results of one layer, are kept in memory.
+    Note that solving from the initial state visits every reachable Minichess position, and
+    is a long offline job; solving from a position later in a game is much quicker.
+    """
+    if game_state is None:
+        game_state = a2_minichess.MinichessGame()
+
+    first_count = game_state.get_move_count()
+    layers = _find_layers(game_state)
+
+    next_boards, next_results = array('Q'), bytearray()
+    for i in range(len(layers) - 1, -1, -1):
+        is_white = game_state.is_white_move() == (i % 2 == 0)
+        results = bytearray()
+        for board in layers[i]:
+            game = a2_minichess.MinichessGame(board, is_white, first_count + i)
+            result = _solve_position(game, next_boards, next_results)
+            results.append(result)
+            yield game.get_zobrist_key(include_move_count=True), result
+
+        next_boards, next_results = layers[i], results
+        layers[i] = None
+
+
+def _find_layers(game_state: a2_minichess.MinichessGame) -> list[array]:
+    """Return the packed boards of the positions reachable from game_state, by move count.
+
+    Layer i is a sorted array of the boards reachable after exactly i moves from game_state.
+    """
+    first_count = game_state.get_move_count()
+    layers = [array('Q', [game_state.get_packed_board()])]
+    is_white = game_state.is_white_move()
+
+    while True:
+        next_layer = set()
+        for board in layers[-1]:
+            game = a2_minichess.MinichessGame(board, is_white, first_count + len(layers) - 1)
+            if game.get_winner() is not None:
+                continue
+            for move in game.get_valid_move_codes():
+                game.push(move)
+                next_layer.add(game.get_packed_board())
+                game.pop()
+
+        if not next_layer:
+            return layers
+
+        layers.append(array('Q', sorted(next_layer)))
+        is_white = not is_white
+
+
+def _solve_position(game: a2_minichess.MinichessGame, next_boards: array,
+                    next_results: bytearray) -> int:
+    """Return the result byte of game, given the sorted packed boards and result bytes of
+    every position one move later.
+    """
+    winner = game.get_winner()
+    if winner == 'Draw':
+        return _DRAW << 6
+    elif winner is not None:
+        return _LOSS << 6
+
+    fastest_win, slowest_loss, can_draw = None, 0, False
+    for move in game.get_valid_move_codes():
+        game.push(move)
+        result = next_results[bisect.bisect_left(next_boards, game.get_packed_board())]
+        game.pop()
+
+        outcome, distance = result >> 6, result & 63
+        if outcome == _LOSS and (fastest_win is None or distance < fastest_win):
+            fastest_win = distance
+        elif outcome == _DRAW:
+            can_draw = True
+        elif outcome == _WIN:
+            slowest_loss = max(slowest_loss, distance)
+
+    if fastest_win is not None:
+        return (_WIN << 6) | (fastest_win + 1)
+    elif can_draw:
+        return _DRAW << 6
+    else:
+        return (_LOSS << 6) | (slowest_loss + 1)
+
+
+def write_tablebase(path: str, entries: Iterator[tuple[int, int]]) -> int:
+    """Write the given (key, result) entries, as yielded by solve, to a tablebase file at path.
+    Return the number of entries written.
+    """
+    keys, results = array('Q'), bytearray()
+    for key, result in entries:
+        keys.append(key)
+        results.append(result)
+
+    capacity = 1
+    while capacity < 2 * len(keys):
+        capacity *= 2
+
+    table_keys, table_results = array('Q', bytes(8 * capacity)), bytearray(capacity)
+    for key, result in zip(keys, results):
+        slot = key & (capacity - 1)
+        while table_keys[slot] != 0 and table_keys[slot] != key:
+            slot = (slot + 1) & (capacity - 1)
+        table_keys[slot] = key
+        table_results[slot] = result
+
+    if sys.byteorder == 'big':
+        table_keys.byteswap()
+
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(_MAGIC, capacity, len(keys)))
+        file.write(table_keys.tobytes())
+        file.write(table_results)
+
+    return len(keys)
+
+
+def build_tablebase(path: str, game_state: Optional[a2_minichess.MinichessGame] = None) -> int:
+    """Solve every position reachable from game_state (the initial state if None) and write
+    the tablebase to path. Return the number of positions solved.
+    """
+    return write_tablebase(path, solve(game_state))
+
+
+class Tablebase:
+    """A tablebase file, opened for lookups.
+
+    >>> import os, tempfile
+    >>> # White has a king on a1 and a queen on b2, Black has a king on d4, and 44 moves
+    >>> # have been made
+    >>> game = a2_minichess.MinichessGame(12 | (11 << 20) | (4 << 60), False, 44)
+    >>> path = os.path.join(tempfile.mkdtemp(), 'example.mctb')
+    >>> build_tablebase(path, game)
+    1140
+    >>> tablebase = Tablebase(path)
+    >>> tablebase.probe(game)  # White wins within 4 moves
+    ('White', 4)
+    >>> tablebase.close()
+    """
+    # Private Instance Attributes:
+    #   - _file: the open tablebase file
+    #   - _data: the memory-mapped contents of the file
+    #   - _capacity: the number of slots in the hash table
+    #   - _results_offset: the offset of the first result byte in _data
+    _file: object
+    _data: mmap.mmap
+    _capacity: int
+    _results_offset: int
+
+    def __init__(self, path: str) -> None:
+        """Open the tablebase file at path.
+
+        Raise a ValueError if the file is not a tablebase.
+        """
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _HEADER.size:
+            self._file.close()
+            raise ValueError(f'{path} is not a Minichess tablebase')
+
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._capacity, _ = _HEADER.unpack_from(self._data, 0)
+        if magic != _MAGIC or size != _HEADER.size + 9 * self._capacity \
+                or self._capacity == 0 or self._capacity & (self._capacity - 1) != 0:
+            self.close()
+            raise ValueError(f'{path} is not a complete Minichess tablebase')
+        self._results_offset = _HEADER.size + 8 * self._capacity
+
+    def __len__(self) -> int:
+        """Return the number of positions in this tablebase."""
+        return _HEADER.unpack_from(self._data, 0)[2]
+
+    def probe_key(self, key: int) -> Optional[int]:
+        """Return the result byte of the position with the given Zobrist key (including the
+        move count), or None if it is not in this tablebase.
+        """
+        mask = self._capacity - 1
+        slot = key & mask
+        while True:
+            slot_key = _KEY.unpack_from(self._data, _HEADER.size + 8 * slot)[0]
+            if slot_key == key:
+                return self._data[self._results_offset + slot]
+            elif slot_key == 0:
+                return None
+            slot = (slot + 1) & mask
+
+    def probe(self, game: a2_minichess.MinichessGame) -> Optional[tuple[str, int]]:
+        """Return the result of game with best play by both players, or None if its position
+        is not in this tablebase.
+
+        The result is a tuple of the winner ('White', 'Black' or 'Draw', like
+        MinichessGame.get_winner) and the number of moves until the game ends.
+        """
+        result = self.probe_key(game.get_zobrist_key(include_move_count=True))
+        if result is None:
+            return None
+
+        outcome, distance = result >> 6, result & 63
+        if outcome == _DRAW:
+            return 'Draw', distance
+        elif (outcome == _WIN) == game.is_white_move():
+            return 'White', distance
+        else:
+            return 'Black', distance
+
+    def close(self) -> None:
+        """Close this tablebase's file."""
+        self._data.close()
+        self._file.close()
+
+
+class TablebasePlayer(a2_minichess.Player):
+    """A Minichess player that plays perfectly using a tablebase.
+
+    On its turn, this player makes the move that wins fastest if it can win, otherwise a
+    drawing move if there is one, otherwise the move that loses most slowly. If a position
+    isn't in the tablebase, it makes a random move.
+    """
+    # Private Instance Attributes:
+    #   - _tablebase: the tablebase this player looks positions up in
+    _tablebase: Tablebase
+
+    def __init__(self, tablebase: Tablebase) -> None:
+        """Initialize this player."""
+        self._tablebase = tablebase
+
+    def copy_for_game(self) -> TablebasePlayer:
+        """Return a copy of this player to play one game, sharing its (read-only) tablebase."""
+        return copy.copy(self)
+
+    def make_move(self, game: a2_minichess.MinichessGame, previous_move: Optional[str]) -> str:
+        """Make a move given the current game.
+
+        previous_move is the opponent player's most recent move, or None if no moves
+        have been made.
+
+        Preconditions:
+            - There is at least one valid move for the given game
+        """
+        best_move, best_rank = None, None
+        for move in game.get_valid_moves():
+            game.push(move)
+            result = self._tablebase.probe_key(game.get_zobrist_key(include_move_count=True))
+            game.pop()
+
+            if result is None:
+                continue
+
+            # Results are for the opponent, who moves next; rank them from best to worst
+            outcome, distance = result >> 6, result & 63
+            if outcome == _LOSS:
+                rank = (0, distance)
+            elif outcome == _DRAW:
+                rank = (1, 0)
+            else:
+                rank = (2, -distance)
+
+            if best_rank is None or rank < best_rank:
+                best_move, best_rank = move, rank
+
+        if best_move is None:
+            return random.choice(game.get_valid_moves())
+        else:
+            return best_move
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['array', 'bisect', 'copy', 'mmap', 'os', 'random', 'struct', 'sys',
+                          'a2_minichess'],
+        'allowed-io': ['write_tablebase', 'Tablebase.__init__']
+    })
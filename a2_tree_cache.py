@@ -0,0 +1,183 @@
+"""An on-disk cache of built Minichess game trees.
+
+Loading a game tree from a large games file, or generating a deep complete game tree, can
+take minutes, and the same trees are built again and again. A TreeCache saves each tree it
+builds (in the binary format of a2_tree_store.write_game_tree), and returns the saved tree the
+next time the same tree is asked for.
+
+Trees are keyed by what they are built from, so a saved tree is never out of date:
+    - a tree loaded from a games file is keyed by a hash of the file's contents (so editing
+      the file gives a new key), and the function used to load it
+    - a complete game tree is keyed by its root move, root position and depth, and the
+      function used to generate it
+
+When the saved trees take up more than the cache's disk budget, the least recently used ones
+are deleted.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import tempfile
+from typing import Callable
+
+import a2_game_tree
+import a2_minichess
+import a2_tree_store
+
+# The file extension of saved trees
+_TREE_EXTENSION = '.mctree'
+# The number of bytes of a games file to hash at a time
+_HASH_CHUNK_SIZE = 1 << 20
+
+
+class TreeCache:
+    """A cache of built game trees, saved in a directory.
+
+    >>> import tempfile
+    >>> import a2_part2
+    >>> cache = TreeCache(tempfile.mkdtemp())
+    >>> game = a2_minichess.MinichessGame()
+    >>> generate = a2_part2.generate_complete_game_tree
+    >>> tree = cache.get_complete_game_tree('*', game, 3, generate)  # Generated and saved
+    >>> cached = cache.get_complete_game_tree('*', game, 3, generate)  # Read from the cache
+    >>> str(cached) == str(tree)
+    True
+    """
+    # Private Instance Attributes:
+    #   - _directory: the directory the saved trees are kept in
+    #   - _max_bytes: the disk budget of this cache, in bytes
+    _directory: str
+    _max_bytes: int
+
+    def __init__(self, directory: str, max_bytes: int = 1 << 30) -> None:
+        """Initialize a cache that keeps saved trees in directory (creating it if necessary),
+        using at most max_bytes bytes of disk space.
+
+        A tree that is bigger than max_bytes on its own is still saved, but is the first to be
+        deleted when another tree is saved.
+
+        Preconditions:
+            - max_bytes >= 0
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._max_bytes = max_bytes
+
+    def get_game_tree(self, games_file: str,
+                      load: Callable[[str], a2_game_tree.GameTree]) -> a2_game_tree.GameTree:
+        """Return the game tree that load(games_file) returns, from this cache if possible.
+
+        load is usually a2_part1.load_game_tree.
+        """
+        key = hashlib.sha256()
+        key.update(f'file:{_function_name(load)}:'.encode('utf-8'))
+        with open(games_file, 'rb') as file:
+            chunk = file.read(_HASH_CHUNK_SIZE)
+            while chunk != b'':
+                key.update(chunk)
+                chunk = file.read(_HASH_CHUNK_SIZE)
+
+        return self._get(key.hexdigest(), lambda: load(games_file))
+
+    def get_complete_game_tree(self, root_move: str, game_state: a2_minichess.MinichessGame,
+                               d: int, generate: Callable[..., a2_game_tree.GameTree]) \
+            -> a2_game_tree.GameTree:
+        """Return the game tree that generate(root_move, game_state, d) returns, from this cache
+        if possible.
+
+        generate is usually a2_part2.generate_complete_game_tree.
+        """
+        position = (game_state.get_packed_board(), game_state.is_white_move(),
+                    game_state.get_move_count())
+        key = f'complete:{_function_name(generate)}:{root_move}:{position}:{d}'
+        return self._get(hashlib.sha256(key.encode('utf-8')).hexdigest(),
+                         lambda: generate(root_move, game_state, d))
+
+    def clear(self) -> None:
+        """Delete every tree saved in this cache."""
+        for path in self._saved_trees():
+            os.remove(path)
+
+    def _get(self, key: str, build: Callable[[], a2_game_tree.GameTree]) \
+            -> a2_game_tree.GameTree:
+        """Return the saved tree with the given key, or else build it with build(), save it
+        and return it.
+
+        A saved tree that can't be read (for example, because it was only partly written) is
+        built and saved again.
+        """
+        path = os.path.join(self._directory, key + _TREE_EXTENSION)
+        game_tree = None
+        try:
+            mapped = a2_tree_store.MappedGameTree(path)
+        except (OSError, ValueError):
+            pass
+        else:
+            try:
+                game_tree = mapped.to_game_tree()
+            except ValueError:
+                pass
+            finally:
+                mapped.close()
+
+        if game_tree is not None:
+            os.utime(path)  # Mark the tree as recently used
+            return game_tree
+
+        game_tree = build()
+
+        # Write to a temporary file first, so that a partly written tree is never seen
+        descriptor, temporary_path = tempfile.mkstemp(suffix='.tmp', dir=self._directory)
+        os.close(descriptor)
+        try:
+            a2_tree_store.write_game_tree(temporary_path, game_tree)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+        self._evict(path)
+        return game_tree
+
+    def _evict(self, keep: str) -> None:
+        """Delete the least recently used saved trees (other than the one at the path keep)
+        until the saved trees fit in the disk budget.
+        """
+        entries = []
+        total = 0
+        for path in self._saved_trees():
+            status = os.stat(path)
+            total += status.st_size
+            if path != keep:
+                entries.append((status.st_mtime_ns, status.st_size, path))
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self._max_bytes:
+                return
+            os.remove(path)
+            total -= size
+
+    def _saved_trees(self) -> list[str]:
+        """Return the paths of the trees saved in this cache."""
+        return [os.path.join(self._directory, name) for name in os.listdir(self._directory)
+                if name.endswith(_TREE_EXTENSION)]
+
+
+def _function_name(function: Callable) -> str:
+    """Return the full name of function, for use in a cache key."""
+    return f'{function.__module__}.{function.__qualname__}'
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['hashlib', 'os', 'tempfile', 'a2_game_tree', 'a2_minichess',
+                          'a2_tree_store'],
+        'allowed-io': ['TreeCache.get_game_tree']
+    })
@@ -0,0 +1,598 @@
+"""Minichess game trees stored compactly in arrays.
+
+Every GameTree node is a separate Python object, with its own attribute dictionary, list of
+subtrees and float; a large learned tree spends far more memory on this bookkeeping than on
+its data. The CompactGameTree in this module stores the nodes of a tree in parallel arrays
+(one entry per node, "struct of arrays"), which takes about 25 bytes per node.
+
+The nodes of a CompactGameTree are accessed through CompactGameTreeNode views, which have the
+same interface as a GameTree, so they can be used by the players in a2_part1, a2_part2 and
+a2_part3. Views are created when they are needed and hold no data of their own.
+
+Any tree can also be saved to a binary file with write_game_tree, and opened again with
+MappedGameTree, which memory-maps the file instead of reading it, so even a very large tree
+is ready to use as soon as it is opened.
+"""
+from __future__ import annotations
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Optional, Union
+
+import a2_game_tree
+import a2_minichess
+
+# The index of a missing child or sibling
+_NO_NODE = -1
+
+_TREE_MAGIC = b'MCTREE01'
+_TREE_HEADER = struct.Struct('<8sQ?15s')
+# The number of bytes in a game tree file for each node (see write_game_tree)
+_TREE_BYTES_PER_NODE = 8 + 4 + 2 + 1 + 1
+
+
+class CompactGameTree:
+    """A Minichess game tree whose nodes are stored in parallel arrays.
+
+    Node 0 is the root. Moves are stored as move codes (see a2_minichess.encode_move), but
+    are given in algebraic notation by the node views, like the moves of a GameTree loaded from
+    a file.
+
+    >>> tree = CompactGameTree()
+    >>> tree.root.insert_move_sequence(['a2b3', 'b4b3', 'c2b3'], 1.0)
+    >>> tree.root.insert_move_sequence(['c2b3', 'b4b3'])
+    >>> len(tree)
+    6
+    >>> [subtree.move for subtree in tree.root.get_subtrees()]
+    ['a2b3', 'c2b3']
+    >>> tree.root.white_win_probability
+    1.0
+    >>> tree.root.find_subtree_by_move('a2b3').find_subtree_by_move('b4b3').is_white_move
+    True
+    """
+    # Private Instance Attributes:
+    #   - _root_move: the move of the root node
+    #   - _moves: the move code of each node (unused for the root)
+    #   - _is_white_move: 1 if White is to make the next move after each node, 0 otherwise
+    #   - _probabilities: the white win probability of each node
+    #   - _first_child: the index of the first subtree of each node, or _NO_NODE
+    #   - _last_child: the index of the last subtree of each node, or _NO_NODE
+    #   - _next_sibling: the index of the next subtree of each node's parent, or _NO_NODE
+    _root_move: Union[str, int]
+    _moves: array
+    _is_white_move: bytearray
+    _probabilities: array
+    _first_child: array
+    _last_child: array
+    _next_sibling: array
+
+    def __init__(self, move: Union[str, int] = a2_game_tree.GAME_START_MOVE,
+                 is_white_move: bool = True, white_win_probability: float = 0.0) -> None:
+        """Initialize a new CompactGameTree with only a root, like GameTree.__init__."""
+        self._root_move = move
+        self._moves = array('B', [0])
+        self._is_white_move = bytearray([is_white_move])
+        self._probabilities = array('d', [white_win_probability])
+        self._first_child = array('i', [_NO_NODE])
+        self._last_child = array('i', [_NO_NODE])
+        self._next_sibling = array('i', [_NO_NODE])
+
+    @classmethod
+    def from_game_tree(cls, game_tree: a2_game_tree.GameTree) -> CompactGameTree:
+        """Return a CompactGameTree with the same moves, subtree order and white win
+        probabilities as game_tree.
+
+        Preconditions:
+            - every move in game_tree (other than the root's) is a valid Minichess move
+        """
+        tree = cls(game_tree.move, game_tree.is_white_move, game_tree.white_win_probability)
+        stack = [(0, game_tree)]
+        while stack:
+            index, node = stack.pop()
+            for subtree in node.get_subtrees():
+                child = tree._add_child(index, _to_code(subtree.move), subtree.is_white_move,
+                                        subtree.white_win_probability)
+                stack.append((child, subtree))
+
+        return tree
+
+    @property
+    def root(self) -> CompactGameTreeNode:
+        """The root node of this tree."""
+        return CompactGameTreeNode(self, 0)
+
+    def __len__(self) -> int:
+        """Return the number of nodes in this tree."""
+        return len(self._probabilities)
+
+    def get_memory_size(self) -> int:
+        """Return the number of bytes used by the node arrays of this tree."""
+        return sum(len(column) * column.itemsize for column in self._columns()) \
+            + len(self._is_white_move)
+
+    def to_game_tree(self) -> a2_game_tree.GameTree:
+        """Return a GameTree with the same moves, subtree order and white win probabilities
+        as this tree.
+        """
+        root = a2_game_tree.GameTree(self._root_move, bool(self._is_white_move[0]),
+                                     self._probabilities[0])
+        stack = [(0, root)]
+        while stack:
+            index, node = stack.pop()
+            child = self._first_child[index]
+            while child != _NO_NODE:
+                subtree = a2_game_tree.GameTree(a2_minichess.decode_move(self._moves[child]),
+                                                bool(self._is_white_move[child]),
+                                                self._probabilities[child])
+                node.add_subtree(subtree)
+                stack.append((child, subtree))
+                child = self._next_sibling[child]
+
+            # Keep the copied probability, rather than the one add_subtree recalculated
+            node.white_win_probability = self._probabilities[index]
+
+        return root
+
+    def _columns(self) -> list[array]:
+        """Return the arrays of this tree (other than _is_white_move)."""
+        return [self._moves, self._probabilities, self._first_child, self._last_child,
+                self._next_sibling]
+
+    def _find_child(self, index: int, code: int) -> int:
+        """Return the index of the subtree of the given node with the given move code, or
+        _NO_NODE if there isn't one.
+        """
+        child = self._first_child[index]
+        while child != _NO_NODE and self._moves[child] != code:
+            child = self._next_sibling[child]
+        return child
+
+    def _add_child(self, index: int, code: int, is_white_move: bool,
+                   white_win_probability: float) -> int:
+        """Append a new subtree to the given node, and return its index.
+
+        The white win probability of the given node is not recalculated.
+        """
+        child = len(self._probabilities)
+        self._moves.append(code)
+        self._is_white_move.append(is_white_move)
+        self._probabilities.append(white_win_probability)
+        self._first_child.append(_NO_NODE)
+        self._last_child.append(_NO_NODE)
+        self._next_sibling.append(_NO_NODE)
+
+        if self._last_child[index] == _NO_NODE:
+            self._first_child[index] = child
+        else:
+            self._next_sibling[self._last_child[index]] = child
+        self._last_child[index] = child
+        return child
+
+    def _insert_move_sequence(self, index: int, moves: list[Union[str, int]],
+                              white_win_probability: float) -> None:
+        """Insert moves below the given node, like GameTree.insert_move_sequence."""
+        path = [index]
+        for move in moves:
+            code = _to_code(move)
+            child = self._find_child(path[-1], code)
+            if child == _NO_NODE:
+                child = self._add_child(path[-1], code, not self._is_white_move[path[-1]],
+                                        white_win_probability)
+            path.append(child)
+
+        for node in reversed(path):
+            self._update_white_win_probability(node)
+
+    def _update_white_win_probability(self, index: int) -> None:
+        """Recalculate the white win probability of the given node from its subtrees, using
+        the same rule as GameTree._update_white_win_probability.
+        """
+        child = self._first_child[index]
+        if child == _NO_NODE:
+            return
+
+        if self._is_white_move[index]:
+            best = self._probabilities[child]
+            child = self._next_sibling[child]
+            while child != _NO_NODE:
+                best = max(best, self._probabilities[child])
+                child = self._next_sibling[child]
+            self._probabilities[index] = best
+        else:
+            probabilities = []
+            while child != _NO_NODE:
+                probabilities.append(self._probabilities[child])
+                child = self._next_sibling[child]
+            self._probabilities[index] = a2_game_tree.average_probability(probabilities)
+
+
+class CompactGameTreeNode:
+    """A view of one node of a CompactGameTree, with the same interface as a GameTree.
+
+    Views hold no data of their own, so any number of them can be created and thrown away;
+    two views of the same node compare equal.
+    """
+    __slots__ = ('_tree', '_index')
+    _tree: CompactGameTree
+    _index: int
+
+    def __init__(self, tree: CompactGameTree, index: int) -> None:
+        """Initialize a view of the node of tree with the given index."""
+        self._tree = tree
+        self._index = index
+
+    @property
+    def move(self) -> Union[str, int]:
+        """The move of this node, in algebraic notation (or the root move, for the root)."""
+        if self._index == 0:
+            return self._tree._root_move
+        return a2_minichess.decode_move(self._tree._moves[self._index])
+
+    @property
+    def is_white_move(self) -> bool:
+        """True if White is to make the next move after this, False otherwise."""
+        return bool(self._tree._is_white_move[self._index])
+
+    @property
+    def white_win_probability(self) -> float:
+        """The white win probability of this node."""
+        return self._tree._probabilities[self._index]
+
+    def get_subtrees(self) -> list[CompactGameTreeNode]:
+        """Return views of the subtrees of this node."""
+        tree = self._tree
+        subtrees = []
+        child = tree._first_child[self._index]
+        while child != _NO_NODE:
+            subtrees.append(CompactGameTreeNode(tree, child))
+            child = tree._next_sibling[child]
+        return subtrees
+
+    def find_subtree_by_move(self, move: Union[str, int]) -> Optional[CompactGameTreeNode]:
+        """Return the subtree corresponding to the given move (in algebraic notation or as a
+        move code).
+
+        Return None if no subtree corresponds to that move.
+        """
+        try:
+            code = _to_code(move)
+        except KeyError:
+            return None
+
+        child = self._tree._find_child(self._index, code)
+        if child == _NO_NODE:
+            return None
+        return CompactGameTreeNode(self._tree, child)
+
+    def best_subtree(self) -> Optional[CompactGameTreeNode]:
+        """Return the subtree with the best white win probability for the player making the
+        next move, like GameTree.best_subtree.
+        """
+        return a2_game_tree.find_best_subtree(self.get_subtrees(), self.is_white_move)
+
+    def insert_move_sequence(self, moves: list[Union[str, int]],
+                             white_win_probability: float = 0.0) -> None:
+        """Insert the given sequence of moves below this node, like
+        GameTree.insert_move_sequence.
+
+        Note that only the white win probabilities of this node and its descendants are
+        recalculated, exactly as for a GameTree.
+
+        Preconditions:
+            - every move in moves is a valid Minichess move
+        """
+        self._tree._insert_move_sequence(self._index, moves, white_win_probability)
+
+    def __eq__(self, other: object) -> bool:
+        """Return whether other is a view of the same node of the same tree."""
+        return isinstance(other, CompactGameTreeNode) and self._tree is other._tree \
+            and self._index == other._index
+
+    def __hash__(self) -> int:
+        """Return a hash of this view, consistent with __eq__."""
+        return hash((id(self._tree), self._index))
+
+    def __str__(self) -> str:
+        """Return a string representation of this tree, in the same format as GameTree."""
+        return self._str_indented(0)
+
+    def _str_indented(self, depth: int) -> str:
+        """Return an indented string representation of this tree.
+
+        The indentation level is specified by the <depth> parameter.
+        """
+        turn_desc = "White's move" if self.is_white_move else "Black's move"
+        s = '  ' * depth + f'{self.move} -> {turn_desc} {self.white_win_probability}\n'
+        for subtree in self.get_subtrees():
+            s += subtree._str_indented(depth + 1)
+        return s
+
+
+def write_game_tree(path: str, game_tree: Union[a2_game_tree.GameTree, CompactGameTreeNode]) \
+        -> int:
+    """Write game_tree to a binary file at path, which can be opened with MappedGameTree, and
+    return the number of nodes written.
+
+    game_tree can be any tree with the GameTree interface. The nodes are written in
+    breadth-first order, so that the subtrees of each node are stored next to each other.
+
+    File format (all integers little-endian):
+        - header: the magic bytes b'MCTREE01', the number of nodes n (unsigned 64-bit), whether
+          the root move is a move code (1 byte), and the root move as UTF-8 text (15 bytes,
+          padded with zero bytes)
+        - n white win probabilities (64-bit floats)
+        - n indices of each node's first subtree (unsigned 32-bit)
+        - n numbers of subtrees (unsigned 16-bit)
+        - n move codes (1 byte; unused for the root)
+        - n sides to move (1 byte; 1 if White is to make the next move after the node)
+
+    Preconditions:
+        - every move in game_tree (other than the root's) is a valid Minichess move
+    """
+    probabilities, first_child, child_count = array('d'), array('I'), array('H')
+    moves, is_white_move = bytearray(), bytearray()
+
+    nodes = [game_tree]
+    i = 0
+    while i < len(nodes):
+        node = nodes[i]
+        subtrees = node.get_subtrees()
+        probabilities.append(node.white_win_probability)
+        first_child.append(len(nodes))
+        child_count.append(len(subtrees))
+        moves.append(0 if i == 0 else _to_code(node.move))
+        is_white_move.append(node.is_white_move)
+        nodes.extend(subtrees)
+        nodes[i] = None  # Nodes are only needed until their subtrees have been queued
+        i += 1
+
+    if sys.byteorder == 'big':
+        for column in (probabilities, first_child, child_count):
+            column.byteswap()
+
+    root_move = game_tree.move
+    with open(path, 'wb') as file:
+        file.write(_TREE_HEADER.pack(_TREE_MAGIC, len(moves), isinstance(root_move, int),
+                                     str(root_move).encode('utf-8')))
+        for column in (probabilities, first_child, child_count):
+            file.write(column.tobytes())
+        file.write(moves)
+        file.write(is_white_move)
+
+    return len(moves)
+
+
+class MappedGameTree:
+    """A game tree file written by write_game_tree, opened with mmap.
+
+    Opening a MappedGameTree takes the same (very short) time for any size of tree: nodes
+    are only read from the file when a MappedGameTreeNode for them is used, and the operating
+    system keeps the parts of the file that are used in memory. A MappedGameTree is
+    read-only; use CompactGameTree.from_game_tree(mapped.root) to get a tree that can be
+    changed.
+
+    This only works on little-endian machines (which includes almost all current ones).
+
+    >>> import os, tempfile
+    >>> tree = a2_game_tree.GameTree()
+    >>> tree.insert_move_sequence(['a2b3', 'b4b3', 'c2b3'], 1.0)
+    >>> tree.insert_move_sequence(['c2b3', 'b4b3'])
+    >>> path = os.path.join(tempfile.mkdtemp(), 'example.mctree')
+    >>> write_game_tree(path, tree)
+    6
+    >>> mapped = MappedGameTree(path)
+    >>> [subtree.move for subtree in mapped.root.get_subtrees()]
+    ['a2b3', 'c2b3']
+    >>> mapped.root.find_subtree_by_move('a2b3').white_win_probability
+    1.0
+    >>> mapped.close()
+    """
+    # Private Instance Attributes:
+    #   - _file: the open game tree file
+    #   - _data: the memory-mapped contents of the file
+    #   - _root_move: the move of the root node
+    #   - _probabilities, _first_child, _child_count, _moves, _is_white_move: views of the
+    #       columns of the file (see write_game_tree), indexed by node
+    _file: object
+    _data: mmap.mmap
+    _root_move: Union[str, int]
+    _probabilities: memoryview
+    _first_child: memoryview
+    _child_count: memoryview
+    _moves: memoryview
+    _is_white_move: memoryview
+
+    def __init__(self, path: str) -> None:
+        """Open the game tree file at path.
+
+        Raise a ValueError if the file is not a complete game tree file, or if this machine is
+        not little-endian.
+        """
+        if sys.byteorder != 'little':
+            raise ValueError('MappedGameTree is only supported on little-endian machines')
+
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _TREE_HEADER.size:
+            self._file.close()
+            raise ValueError(f'{path} is not a Minichess game tree file')
+
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, root_is_code, root_move = _TREE_HEADER.unpack_from(self._data, 0)
+        if magic != _TREE_MAGIC or size != _TREE_HEADER.size + n * _TREE_BYTES_PER_NODE:
+            self._data.close()
+            self._file.close()
+            raise ValueError(f'{path} is not a complete Minichess game tree file')
+
+        root_move = root_move.rstrip(b'\0').decode('utf-8')
+        self._root_move = int(root_move) if root_is_code else root_move
+
+        data = memoryview(self._data)
+        offset = _TREE_HEADER.size
+        columns = []
+        for typecode, itemsize in (('d', 8), ('I', 4), ('H', 2), ('B', 1), ('B', 1)):
+            columns.append(data[offset:offset + n * itemsize].cast(typecode))
+            offset += n * itemsize
+        data.release()
+        self._probabilities, self._first_child, self._child_count, self._moves, \
+            self._is_white_move = columns
+
+    @property
+    def root(self) -> MappedGameTreeNode:
+        """The root node of this tree."""
+        return MappedGameTreeNode(self, 0)
+
+    def to_game_tree(self) -> a2_game_tree.GameTree:
+        """Return a GameTree with the same moves, subtree order and white win probabilities
+        as this tree, read fully into memory.
+
+        Raise a ValueError if the subtrees of this tree's nodes are not stored in
+        breadth-first order, as write_game_tree stores them (for example, because the file
+        is damaged).
+        """
+        root = a2_game_tree.GameTree(self._root_move, bool(self._is_white_move[0]),
+                                     self._probabilities[0])
+        nodes = [root]
+        for index in range(0, len(self._moves)):
+            # Each node must have been reached already, and its subtrees must come next
+            first, count = self._first_child[index], self._child_count[index]
+            if index >= len(nodes) or (count > 0 and first != len(nodes)) \
+                    or first + count > len(self._moves):
+                raise ValueError('The subtrees of this tree are not in breadth-first order')
+
+            node = nodes[index]
+            for child in range(first, first + count):
+                subtree = a2_game_tree.GameTree(a2_minichess.decode_move(self._moves[child]),
+                                                bool(self._is_white_move[child]),
+                                                self._probabilities[child])
+                node.add_subtree(subtree)
+                nodes.append(subtree)
+
+            # Keep the stored probability, rather than the one add_subtree recalculated
+            node.white_win_probability = self._probabilities[index]
+            nodes[index] = None
+
+        return root
+
+    def __len__(self) -> int:
+        """Return the number of nodes in this tree."""
+        return len(self._moves)
+
+    def close(self) -> None:
+        """Close this tree's file. Nodes of this tree must not be used afterwards."""
+        for column in (self._probabilities, self._first_child, self._child_count, self._moves,
+                       self._is_white_move):
+            column.release()
+        self._data.close()
+        self._file.close()
+
+
+class MappedGameTreeNode:
+    """A read-only view of one node of a MappedGameTree, with the same interface as a GameTree
+    (apart from insert_move_sequence and add_subtree).
+    """
+    __slots__ = ('_tree', '_index')
+    _tree: MappedGameTree
+    _index: int
+
+    def __init__(self, tree: MappedGameTree, index: int) -> None:
+        """Initialize a view of the node of tree with the given index."""
+        self._tree = tree
+        self._index = index
+
+    @property
+    def move(self) -> Union[str, int]:
+        """The move of this node, in algebraic notation (or the root move, for the root)."""
+        if self._index == 0:
+            return self._tree._root_move
+        return a2_minichess.decode_move(self._tree._moves[self._index])
+
+    @property
+    def is_white_move(self) -> bool:
+        """True if White is to make the next move after this, False otherwise."""
+        return bool(self._tree._is_white_move[self._index])
+
+    @property
+    def white_win_probability(self) -> float:
+        """The white win probability of this node."""
+        return self._tree._probabilities[self._index]
+
+    def get_subtrees(self) -> list[MappedGameTreeNode]:
+        """Return views of the subtrees of this node."""
+        first = self._tree._first_child[self._index]
+        return [MappedGameTreeNode(self._tree, child)
+                for child in range(first, first + self._tree._child_count[self._index])]
+
+    def find_subtree_by_move(self, move: Union[str, int]) -> Optional[MappedGameTreeNode]:
+        """Return the subtree corresponding to the given move (in algebraic notation or as a
+        move code).
+
+        Return None if no subtree corresponds to that move.
+        """
+        try:
+            code = _to_code(move)
+        except KeyError:
+            return None
+
+        moves = self._tree._moves
+        first = self._tree._first_child[self._index]
+        for child in range(first, first + self._tree._child_count[self._index]):
+            if moves[child] == code:
+                return MappedGameTreeNode(self._tree, child)
+
+        return None
+
+    def best_subtree(self) -> Optional[MappedGameTreeNode]:
+        """Return the subtree with the best white win probability for the player making the
+        next move, like GameTree.best_subtree.
+        """
+        return a2_game_tree.find_best_subtree(self.get_subtrees(), self.is_white_move)
+
+    def __eq__(self, other: object) -> bool:
+        """Return whether other is a view of the same node of the same tree."""
+        return isinstance(other, MappedGameTreeNode) and self._tree is other._tree \
+            and self._index == other._index
+
+    def __hash__(self) -> int:
+        """Return a hash of this view, consistent with __eq__."""
+        return hash((id(self._tree), self._index))
+
+    def __str__(self) -> str:
+        """Return a string representation of this tree, in the same format as GameTree."""
+        return self._str_indented(0)
+
+    def _str_indented(self, depth: int) -> str:
+        """Return an indented string representation of this tree.
+
+        The indentation level is specified by the <depth> parameter.
+        """
+        turn_desc = "White's move" if self.is_white_move else "Black's move"
+        s = '  ' * depth + f'{self.move} -> {turn_desc} {self.white_win_probability}\n'
+        for subtree in self.get_subtrees():
+            s += subtree._str_indented(depth + 1)
+        return s
+
+
+def _to_code(move: Union[str, int]) -> int:
+    """Return the move code of move, which is given in algebraic notation or as a move code.
+
+    Raise a KeyError if move is a string that isn't a move in algebraic notation.
+    """
+    if isinstance(move, int):
+        return move
+    return a2_minichess.encode_move(move)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['array', 'mmap', 'os', 'struct', 'sys', 'a2_game_tree', 'a2_minichess'],
+        'allowed-io': ['write_game_tree', 'MappedGameTree.__init__']
+    })